@@ -0,0 +1,63 @@
+'''Memory and groupby time of the stat frames with and without the compact dtypes.
+
+Loads league seasons of synthetic payloads through the normal fetch / normalize /
+combine path and concatenates them, once with the dtypes declared in tables applied
+and once with apply_dtypes disabled (the previous object / int64 / float64 frames).
+Reports the deep memory usage of the concatenated frames and the time of a
+team level groupby over them.
+
+    python -m benchmarks.bench_dtypes --leagues OHL WHL QMJHL --seasons 20
+'''
+
+import pandas as pd
+import argparse
+import time
+
+from ep_data_loader import ep_data_loader
+from benchmarks.fixtures import OfflineTransport
+
+def load(leagues, seasons):
+    transport = OfflineTransport()
+    skaters, goalies, standings = [], [], []
+
+    for league in leagues:
+        for year in [f'{s}-{s + 1}' for s in range(2024 - seasons, 2024)]:
+            team_standings, player_stats, goalie_stats = ep_data_loader.scrape_league_season_stats(league, year, transport)
+            standings.append(team_standings)
+            skaters.append(player_stats)
+            goalies.append(goalie_stats)
+
+    # multi season frames keep their dtypes the same way a league season does
+    return {'team_stats' : ep_data_loader.apply_dtypes(pd.concat(standings), ep_data_loader.tables['team_standing']['dtypes']),
+            'skater_stats' : ep_data_loader.apply_dtypes(pd.concat(skaters), ep_data_loader.tables['skaters']['dtypes']),
+            'goalie_stats' : ep_data_loader.apply_dtypes(pd.concat(goalies), ep_data_loader.tables['goalies']['dtypes'])}
+
+def groupby_seconds(skaters, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        skaters.groupby(['league', 'teamid', 'year', 'season_stage'], observed=True)[['g', 'a', 'tp', 'gp']].sum()
+
+    return (time.perf_counter() - start) / repeat
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--leagues', nargs='+', default=['OHL', 'WHL', 'QMJHL'])
+    parser.add_argument('--seasons', type=int, default=20, help='Seasons per league')
+    args = parser.parse_args()
+
+    apply_dtypes = ep_data_loader.apply_dtypes
+    results = {}
+    for label in ['before', 'after']:
+        ep_data_loader.apply_dtypes = (lambda df, dtypes: df) if label == 'before' else apply_dtypes
+        frames = load(args.leagues, args.seasons)
+        results[label] = ({name : df.memory_usage(deep=True).sum() for name, df in frames.items()},
+                          groupby_seconds(frames['skater_stats']), len(frames['skater_stats']))
+    ep_data_loader.apply_dtypes = apply_dtypes
+
+    print(f'{results["after"][2]} skater rows, {len(args.leagues)} leagues x {args.seasons} seasons')
+    for name in results['before'][0]:
+        before, after = results['before'][0][name], results['after'][0][name]
+        print(f'{name:<13} before: {before / 1024 ** 2:7.2f} MiB  after: {after / 1024 ** 2:7.2f} MiB  '
+              f'reduction: {1 - after / before:5.1%}')
+    print(f'team groupby  before: {results["before"][1] * 1000:7.1f} ms   after: {results["after"][1] * 1000:7.1f} ms')
@@ -0,0 +1,46 @@
+'''Peak python memory of full_data_load as the number of league seasons grows.
+
+Each league season is written as soon as it is loaded and player information is
+collected every chunk_size new players, so the peak should stay flat instead of
+growing with the number of seasons. Measured with tracemalloc on synthetic payloads.
+
+    python -m benchmarks.bench_memory --seasons 2 8 32 --engine async
+'''
+
+import tracemalloc
+import argparse
+import tempfile
+import time
+import os
+
+from ep_data_loader import ep_data_loader
+from benchmarks.fixtures import OfflineTransport
+
+def run(seasons, engine, player_info):
+    scraper = ep_data_loader.Scraper(leagues=['OHL'], start_year=2024 - seasons, end_year=2023,
+                                     transport=OfflineTransport())
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    scraper.full_data_load(collect_player_info=player_info, engine=engine, chunk_size=500)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak, elapsed
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seasons', type=int, nargs='+', default=[2, 8, 32], help='League seasons to load')
+    parser.add_argument('--engine', default='sync', choices=['sync', 'async'])
+    parser.add_argument('--no_player_info', action='store_true', help='Skip player information')
+    args = parser.parse_args()
+
+    # outputs go to a throwaway data directory
+    os.chdir(tempfile.mkdtemp())
+
+    results = [(seasons, *run(seasons, args.engine, not args.no_player_info)) for seasons in args.seasons]
+
+    for seasons, peak, elapsed in results:
+        print(f'{seasons:>4} seasons  peak: {peak / 1024 ** 2:7.1f} MiB  runtime: {elapsed:6.1f} s')
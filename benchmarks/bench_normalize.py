@@ -0,0 +1,84 @@
+'''playerStats payload normalization benchmark.
+
+Times the previous skater normalization (three .apply passes and one frame per season
+stage merged back onto the players) against normalize_player_stats, with and without
+calculate_player_metrics, over many team sized payloads or a few very large ones.
+
+    python -m benchmarks.bench_normalize --players 25 --payloads 400
+    python -m benchmarks.bench_normalize --players 20000 --payloads 4
+'''
+
+import argparse
+import time
+
+import pandas as pd
+
+from ep_data_loader.ep_data_loader import base_url, calculate_player_metrics, normalize_player_stats
+from benchmarks.fixtures import skater_payload
+
+stat_cols = ['GP', 'G', 'A', 'PTS', 'PIM', 'PM']
+player_cols = ['player', 'position', 'playerid', 'url', 'shortname']
+
+def previous_skater_stats(data, metrics=calculate_player_metrics):
+    '''get_skater_stats normalization as it was before normalize_player_stats'''
+
+    stages = [s for s in data['data']['playerStats']['edges'][0] if 'Stats' in s]
+
+    players = pd.DataFrame([d['player'] for d in data['data']['playerStats']['edges']])\
+    .rename(columns={'name' : 'player', 'detailedPosition' : 'position'})
+    players['playerid'] = players.eliteprospectsUrlPath.apply(lambda x : x.split('/')[2])
+    players['url'] = base_url + '/player/' + players.eliteprospectsUrlPath
+    players['shortname'] = players.eliteprospectsUrlPath.apply(lambda x : x.split('/')[3])
+
+    player_stats = []
+    for stage in stages:
+        stats = pd.DataFrame(
+            [d[stage] if d[stage] else { col: 0 for col in stat_cols} \
+             for d in data['data']['playerStats']['edges']])\
+                                  .assign(season_stage=stage)\
+                                  .rename(columns={'PTS' : 'TP'})\
+                                  .drop(columns=['__typename'], errors='ignore')
+
+        stats.columns = [col.lower() for col in stats.columns]
+        stats = stats[stats['gp'] > 0]
+        player_stats.append(metrics(stats))
+
+    player_stats = pd.concat(player_stats)
+
+    return players[player_cols].merge(player_stats, left_index=True, right_index=True)
+
+def current_skater_stats(data, metrics=calculate_player_metrics):
+    return metrics(normalize_player_stats(data, stat_cols))
+
+def no_metrics(df):
+    return df
+
+def timeit(func, payloads, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            func(payload)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=25, help='Players per payload')
+    parser.add_argument('--payloads', type=int, default=400, help='Number of payloads')
+    parser.add_argument('--repeat', type=int, default=5, help='Best of n runs')
+    args = parser.parse_args()
+
+    payloads = [skater_payload(f'team{i}', '2019-2020', args.players) for i in range(args.payloads)]
+    rows = sum(len(p['data']['playerStats']['edges']) for p in payloads)
+
+    pd.testing.assert_frame_equal(previous_skater_stats(payloads[0]).sort_index(kind='stable'),
+                                  current_skater_stats(payloads[0]))
+
+    for label, metrics in [('normalize', no_metrics), ('normalize + metrics', calculate_player_metrics)]:
+        print(label)
+        for version, func in [('previous', previous_skater_stats), ('current', current_skater_stats)]:
+            elapsed = timeit(lambda payload: func(payload, metrics), payloads, args.repeat)
+            print(f'  {version:<9} {elapsed * 1000:8.1f} ms  {rows / elapsed:10.0f} players/s')
@@ -0,0 +1,52 @@
+'''Time to find the new players of a batch against a large player_info table.
+
+Compares the previous get_playerid_delta filter (astype(int) copy of the batch and
+isin against every playerid read from the table) with PlayerIndex.unknown, and
+times saving and loading the index file. The time to read the playerids from the
+database, which the index only pays for new rows, is not included.
+
+    python -m benchmarks.bench_player_index --known 1000000 --batch 5000
+'''
+
+import pandas as pd
+import numpy as np
+import tempfile
+import argparse
+import time
+import os
+
+from ep_data_loader.player_index import PlayerIndex
+
+def timed(func, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+
+    return result, (time.perf_counter() - start) / repeat
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--known', type=int, default=1000000, help='Players in player_info')
+    parser.add_argument('--batch', type=int, default=5000, help='Players checked')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    known = rng.choice(2000000, args.known, replace=False)
+    player_ids = pd.DataFrame({'playerid' : known.astype(str)})
+    batch = pd.DataFrame({'playerid' : rng.choice(2000000, args.batch).astype(str), 'shortname' : 'player'})
+
+    index = PlayerIndex(os.path.join(tempfile.mkdtemp(), 'player_index.npz'))
+    index.add(player_ids.playerid)
+
+    before, before_seconds = timed(lambda: batch[~batch.playerid.astype(int).isin(player_ids.playerid.astype(int))])
+    after, after_seconds = timed(lambda: index.unknown(batch))
+    assert before.playerid.tolist() == after.playerid.tolist()
+
+    _, save_seconds = timed(index.save)
+    _, load_seconds = timed(lambda: PlayerIndex(index.path))
+
+    print(f'{args.batch} players against {args.known} known, {len(after)} new')
+    print(f'isin     {before_seconds * 1000:8.2f} ms')
+    print(f'index    {after_seconds * 1000:8.2f} ms')
+    print(f'save {save_seconds * 1000:.1f} ms  load {load_seconds * 1000:.1f} ms  size {os.path.getsize(index.path) / 1024 ** 2:.1f} MiB')
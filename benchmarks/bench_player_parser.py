@@ -0,0 +1,48 @@
+'''Player page parsing micro-benchmark.
+
+Parses the same player pages with every parser backend and checks they agree with
+the BeautifulSoup implementation. Uses the .html files in --pages when given,
+otherwise synthetic pages from benchmarks.fixtures.
+
+    python -m benchmarks.bench_player_parser --pages path/to/player/pages
+'''
+
+import argparse
+import glob
+import time
+import os
+
+from ep_data_loader.ep_data_loader import get_fast_player_info, HTMLParser
+from benchmarks.fixtures import player_page
+
+def load_pages(path, n):
+    if path:
+        pages = []
+        for file in sorted(glob.glob(os.path.join(path, '*.html')))[:n]:
+            with open(file, encoding='utf-8') as f:
+                pages.append(f.read())
+        return pages
+
+    return [player_page(str(i), f'player-{i}') for i in range(n)]
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', default=None, help='Directory of stored player .html pages')
+    parser.add_argument('-n', type=int, default=500, help='Number of pages to parse')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.n)
+    expected = [get_fast_player_info(page, 'bs4') for page in pages]
+
+    backends = ['bs4', 'lxml'] + (['selectolax'] if HTMLParser is not None else [])
+
+    print(f'{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB average')
+    for backend in backends:
+        start = time.perf_counter()
+        results = [get_fast_player_info(page, backend) for page in pages]
+        elapsed = time.perf_counter() - start
+
+        mismatches = sum(result != exp for result, exp in zip(results, expected))
+        print(f'{backend:<11} {elapsed / len(pages) * 1000:7.3f} ms/page  {len(pages) / elapsed:8.0f} pages/s  '
+              f'mismatches: {mismatches}')
@@ -0,0 +1,49 @@
+'''Per team request count and latency of the standings-less team stats path.
+
+Compares the previous get_player_stats (team html page, then skater and goalie
+requests one after another) with the current one (skater and goalie requests only,
+fetched concurrently).
+
+    python -m benchmarks.bench_team_fetch --latency 0.2 --teams 10
+'''
+
+from bs4 import BeautifulSoup
+import argparse
+import time
+
+from ep_data_loader import ep_data_loader
+from ep_data_loader.ep_data_loader import base_url, get_skater_stats, get_goalie_stats, get_player_stats
+from benchmarks.fixtures import OfflineTransport, team_list
+
+def previous_get_player_stats(year, teamid, teamshort, league, transport):
+    '''get_player_stats as it was before the html page fetch was removed'''
+
+    url = f'{base_url}/team/{teamid}/{teamshort}/{year}?tab=stats#players'
+    text = transport.get(url).text
+    soup = BeautifulSoup(text, features='lxml')
+
+    return get_skater_stats(year, teamid, teamshort, league, transport), \
+        get_goalie_stats(year, teamid, teamshort, league, transport)
+
+def run(func, teams, year, league, latency):
+    transport = OfflineTransport(latency=latency)
+    start = time.perf_counter()
+    for teamid, team in teams:
+        func(year, teamid, team, league, transport)
+    elapsed = time.perf_counter() - start
+
+    return transport.requests / len(teams), elapsed / len(teams)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.2, help='Simulated seconds per request')
+    parser.add_argument('--teams', type=int, default=10, help='Number of teams to fetch')
+    args = parser.parse_args()
+
+    league, year = 'OHL', '2019-2020'
+    teams = team_list(league, year, args.teams)
+
+    for label, func in [('before', previous_get_player_stats), ('after', get_player_stats)]:
+        requests_per_team, seconds_per_team = run(func, teams, year, league, args.latency)
+        print(f'{label:<7} requests/team: {requests_per_team:.1f}  latency/team: {seconds_per_team * 1000:.0f} ms')
@@ -0,0 +1,180 @@
+'''Synthetic elite prospects payloads and an offline transport used by the benchmarks.'''
+
+import urllib.parse
+import datetime
+import random
+import json
+import time
+
+from ep_data_loader.transport import Transport
+
+skater_stat_cols = ['GP', 'G', 'A', 'PTS', 'PIM', 'PM']
+stages = ['regularStats', 'postseasonStats']
+
+def team_list(league, season, n_teams=12):
+    '''Return a deterministic list of (teamid, name) for a league season'''
+
+    rnd = random.Random(f'{league}{season}')
+    return [(str(rnd.randint(1, 99999)), f'{league.lower()}-team-{i}') for i in range(n_teams)]
+
+def _player(rnd, position):
+    playerid = rnd.randint(1, 900000)
+    return {'name' : f'Player {playerid}',
+            'detailedPosition' : position,
+            'eliteprospectsUrlPath' : f'/player/{playerid}/player-{playerid}',
+            '__typename' : 'Player'}
+
+def _skater_line(rnd):
+    g, a = rnd.randint(0, 40), rnd.randint(0, 50)
+    return {'GP' : rnd.randint(0, 68), 'G' : g, 'A' : a, 'PTS' : g + a,
+            'PIM' : rnd.randint(0, 90), 'PM' : rnd.randint(-20, 20), '__typename' : 'SkaterStats'}
+
+def _goalie_line(rnd):
+    return {'GP' : rnd.randint(0, 60), 'GAA' : round(rnd.uniform(1.5, 4.5), 2),
+            'SVP' : round(rnd.uniform(0.86, 0.94), 3), '__typename' : 'GoalieStats'}
+
+def skater_payload(team, season, n_players=25):
+    '''SkaterStats response for a team season'''
+
+    rnd = random.Random(f'skaters{team}{season}')
+    edges = [{'player' : _player(rnd, rnd.choice(['C', 'LW', 'RW', 'D', 'C/LW'])),
+              'regularStats' : _skater_line(rnd),
+              'postseasonStats' : _skater_line(rnd) if rnd.random() < 0.5 else None}
+             for _ in range(n_players)]
+
+    return {'data' : {'playerStats' : {'edges' : edges}}}
+
+def goalie_payload(team, season, n_players=3):
+    '''GoaltenderStats response for a team season'''
+
+    rnd = random.Random(f'goalies{team}{season}')
+    edges = [{'player' : _player(rnd, 'G'),
+              'regularStats' : _goalie_line(rnd),
+              'postseasonStats' : _goalie_line(rnd) if rnd.random() < 0.5 else None}
+             for _ in range(n_players)]
+
+    return {'data' : {'playerStats' : {'edges' : edges}}}
+
+def league_seasons(league, last_year=None):
+    '''Return the seasons a league has data for, from a deterministic first season to last_year
+    (defaults to the season starting this year)'''
+
+    last_year = last_year or datetime.date.today().year
+    first_year = random.Random(f'seasons{league.lower()}').randint(1960, 2000)
+    return [f'{year}-{year + 1}' for year in range(first_year, last_year + 1)]
+
+def standings_payload(league, season, n_teams=12):
+    '''LeagueStandingsAndSeasons response for a league season, standings are empty for seasons
+    the league has no data for'''
+
+    seasons = league_seasons(league)
+    metadata = {'seasons' : [{'slug' : slug, 'startYear' : int(slug[:4])} for slug in seasons]}
+    if season not in seasons:
+        return {'data' : {'leagueStandings' : [], 'league' : metadata}}
+
+    rnd = random.Random(f'standings{league}{season}')
+    standings = [{'teamName' : name,
+                  'team' : {'eliteprospectsUrlPath' : f'/team/{teamid}/{name}'},
+                  'stats' : {'GP' : 68, 'W' : rnd.randint(10, 50), 'T' : 0, 'L' : rnd.randint(10, 50),
+                             'OTW' : rnd.randint(0, 8), 'OTL' : rnd.randint(0, 8), 'GF' : rnd.randint(150, 300),
+                             'GA' : rnd.randint(150, 300), 'GD' : 0, 'PTS' : rnd.randint(30, 110)}}
+                 for teamid, name in team_list(league, season, n_teams)]
+
+    return {'data' : {'leagueStandings' : standings, 'league' : metadata}}
+
+def team_comparison_payload(league, season, n_teams=12):
+    '''LeagueTeamComparison response for a league season, empty for seasons the league has no data for'''
+
+    if season not in league_seasons(league):
+        return {'data' : {'leagueTeamComparison' : []}}
+
+    return {'data' : {'leagueTeamComparison' : [{'team' : {'id' : teamid, 'name' : name}}
+                                                for teamid, name in team_list(league, season, n_teams)]}}
+
+def player_page(playerid, shortname):
+    '''Player profile html page with a player-facts section'''
+
+    rnd = random.Random(f'player{playerid}')
+    facts = [
+        ('Date of Birth', f'<a href="#">{rnd.choice(["Jan", "Mar", "Jul", "Nov"])} {rnd.randint(10, 28)}, {rnd.randint(1980, 2007)}</a>'),
+        ('Age', str(rnd.randint(16, 40))),
+        ('Place of Birth', '<a href="#">Toronto, ON, CAN</a>'),
+        ('Nation', '<a href="#">\n Canada\n</a>'),
+        ('Position', rnd.choice(['C', 'D', 'LW', 'G'])),
+        ('Height', f'{rnd.randint(170, 200)} cm / 6\'0"'),
+        ('Weight', f'{rnd.randint(70, 100)} kg / 190 lbs'),
+        ('Shoots', rnd.choice(['L', 'R'])),
+        ('Youth Team', '<a href="#">Toronto Marlboros</a>'),
+        ('Drafted', f'<a href="#">{rnd.randint(2000, 2023)} round {rnd.randint(1, 7)} #{rnd.randint(1, 224)} overall by Toronto Maple Leafs</a>'),
+    ]
+    items = '\n'.join(f'<li class="PlayerFacts_factItem"><span class="PlayerFacts_factLabel">{k}</span>{v}</li>'
+                      for k, v in facts)
+    filler = '\n'.join(f'<div class="row"><p>filler {i}</p><a href="/news/{i}">news {i}</a></div>' for i in range(400))
+
+    return (f'<!DOCTYPE html><html><head><title>{shortname}</title></head><body>'
+            f'<nav>{filler}</nav>'
+            f'<section id="player-facts" class="PlayerFacts"><ul>{items}</ul></section>'
+            f'<footer>{filler}</footer></body></html>')
+
+def team_page(teamid, shortname, season):
+    '''Team roster html page'''
+
+    filler = '\n'.join(f'<tr><td>{i}</td><td><a href="/player/{i}/p">p</a></td></tr>' for i in range(300))
+    return f'<html><body><table>{filler}</table></body></html>'
+
+def respond(url):
+    '''Return (status, body) for an elite prospects url'''
+
+    parsed = urllib.parse.urlparse(url)
+    query = urllib.parse.parse_qs(parsed.query)
+
+    if 'operationName' in query:
+        operation = query['operationName'][0]
+        variables = json.loads(query['variables'][0])
+
+        if operation == 'LeagueStandingsAndSeasons':
+            payload = standings_payload(variables['slug'], variables['season'])
+        elif operation == 'LeagueTeamComparison':
+            payload = team_comparison_payload(variables['slug'], variables['season'])
+        elif operation == 'SkaterStats':
+            payload = skater_payload(variables['team'], variables['season'])
+        elif operation == 'GoaltenderStats':
+            payload = goalie_payload(variables['team'], variables['season'])
+        else:
+            return 404, ''
+
+        return 200, json.dumps(payload)
+
+    parts = parsed.path.strip('/').split('/')
+    if parts[0] == 'player':
+        return 200, player_page(parts[1], parts[2])
+    if parts[0] == 'team':
+        return 200, team_page(parts[1], parts[2], parts[3])
+
+    return 404, ''
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode()
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f'HTTP {self.status_code}')
+
+class OfflineTransport(Transport):
+    '''Transport answering from the synthetic fixtures after sleeping `latency` seconds.
+    Counts the requests made.'''
+
+    def __init__(self, latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.requests = 0
+
+    def get(self, url, headers=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        return FakeResponse(*respond(url))
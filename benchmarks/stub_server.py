@@ -0,0 +1,195 @@
+'''Local HTTP stand-in for the elite prospects hosts.
+
+Serves recorded responses from a fixture directory (see FixtureStore), falling back to
+the synthetic payloads of benchmarks.fixtures, with configurable latency and injected
+503 / 429 errors. A Transport is pointed at it with use_stub, which rewrites
+https://{host}/{path} to http://{address}/{host}/{path} below the Transport so retries,
+rate limiting and metrics behave as they do against the real hosts.
+
+    python -m benchmarks.stub_server --port 8765 --latency 0.05 --error_rate 0.02
+'''
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+import multiprocessing
+import threading
+import argparse
+import hashlib
+import random
+import json
+import time
+import os
+
+from ep_data_loader.transport import Transport
+from benchmarks.fixtures import respond
+
+class FixtureStore(object):
+    '''Recorded responses, one json file ({url, status, body}) per url in directory'''
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+    def get(self, url):
+        '''Return (status, body) recorded for url, None if it was not recorded'''
+
+        try:
+            with open(self.path(url)) as f:
+                recorded = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        return recorded['status'], recorded['body']
+
+    def put(self, url, status, body):
+        with open(self.path(url), 'w') as f:
+            json.dump({'url' : url, 'status' : status, 'body' : body}, f)
+
+class RecordingTransport(Transport):
+    '''Transport saving every successful response to a FixtureStore, to record fixtures from
+    a real load'''
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def get(self, url, headers=None):
+        response = super().get(url, headers)
+        if response.status_code == 200:
+            self.store.put(url, response.status_code, response.text)
+
+        return response
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        # /{host}/{path}?{query} back to the url the loader asked for
+        host, _, path = self.path.lstrip('/').partition('/')
+        url = f'https://{host}/{path}'
+
+        time.sleep(server.latency * (1 + server.jitter * (2 * random.random() - 1)))
+
+        with server.lock:
+            roll = server.random.random()
+
+        headers = {}
+        if roll < server.error_rate:
+            status, body = 503, 'injected error'
+        elif roll < server.error_rate + server.throttle_rate:
+            status, body = 429, 'injected throttle'
+            headers['Retry-After'] = str(server.retry_after)
+        else:
+            recorded = server.store.get(url) if server.store is not None else None
+            status, body = recorded if recorded is not None else respond(url)
+
+        content = body.encode()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    '''Threaded stub server, each request sleeps latency seconds (+/- jitter as a fraction) and
+    fails with a 503 with probability error_rate or a 429 with probability throttle_rate'''
+
+    daemon_threads = True
+
+    def __init__(self,
+        address=('127.0.0.1', 0),
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        fixtures=None,
+        seed=0
+        ):
+
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.store = FixtureStore(fixtures) if fixtures else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    @property
+    def address(self):
+        return f'{self.server_address[0]}:{self.server_address[1]}'
+
+def _serve(ready, options):
+    server = StubServer(**options)
+    ready.put(server.address)
+    server.serve_forever()
+
+def start_stub_process(**options):
+    '''Run a StubServer in its own process, so serving does not compete with the loader for the
+    GIL or show up in its memory. Returns (process, address).'''
+
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(ready, options), daemon=True)
+    process.start()
+
+    return process, ready.get(timeout=30)
+
+class StubAdapter(HTTPAdapter):
+    '''Sends https://{host}/{path} requests to http://{address}/{host}/{path} and counts them by
+    graphql operation (or first path segment for html pages)'''
+
+    def __init__(self, address, **kwargs):
+        super().__init__(**kwargs)
+        self.address = address
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        query = dict(part.split('=', 1) for part in parsed.query.split('&') if '=' in part)
+        kind = query.get('operationName') or parsed.path.strip('/').split('/')[0]
+
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+        request = request.copy()
+        request.url = f'http://{self.address}/{parsed.netloc}{parsed.path}' + (f'?{parsed.query}' if parsed.query else '')
+
+        return super().send(request, **kwargs)
+
+def use_stub(transport, address, pool_size=16):
+    '''Point a Transport at the stub server, returns the StubAdapter counting its requests'''
+
+    adapter = StubAdapter(address, pool_maxsize=pool_size, max_retries=0)
+    transport.session.mount('https://', adapter)
+
+    return adapter
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Latency jitter as a fraction of latency')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of requests answered with a 503')
+    parser.add_argument('--throttle_rate', type=float, default=0.0, help='Fraction of requests answered with a 429')
+    parser.add_argument('--fixtures', default=None, help='Directory of recorded responses')
+    args = parser.parse_args()
+
+    server = StubServer(('127.0.0.1', args.port), args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                        fixtures=args.fixtures)
+    print(f'Serving on {server.address}')
+    server.serve_forever()
@@ -0,0 +1,114 @@
+import threading
+import datetime
+import time
+import zlib
+
+from ep_data_loader.ep_data_loader import get_current_year
+from ep_data_loader.sqlite_store import connect
+
+class ResponseCache(object):
+    '''Persistent response cache stored in a SQLite file. Bodies are zlib compressed and keyed by
+    graphql operation name plus variables, or by url for html pages.
+
+    Responses for completed seasons never expire, the current season (see get_current_year) expires
+    after `current_season_ttl` seconds and responses without a season (player pages) after
+    `default_ttl` seconds. When the cache grows past `max_bytes` the least recently used
+    responses are evicted.
+    '''
+
+    def __init__(self,
+        path='data/cache/responses.sqlite',
+        max_bytes=2 * 1024 ** 3,
+        current_season_ttl=6 * 60 * 60,
+        default_ttl=30 * 24 * 60 * 60
+        ):
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.current_season_ttl = current_season_ttl
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+
+        self.conn = connect(path, '''
+            create table if not exists responses (
+                key text primary key,
+                body blob not null,
+                size integer not null,
+                expires real,
+                accessed real not null
+            )''', 'create index if not exists responses_accessed on responses (accessed)')
+
+        self.size = self.conn.execute('select coalesce(sum(size), 0) from responses').fetchone()[0]
+
+    def ttl(self, season=None):
+        '''Return seconds a response should live for, None meaning forever'''
+
+        if season is None:
+            return self.default_ttl
+
+        # seasons are labelled 'YYYY-YYYY' so they sort chronologically as strings
+        if season < get_current_year(datetime.date.today()):
+            return None
+
+        return self.current_season_ttl
+
+    def get(self, key):
+        '''Return the cached body for key or None when missing or expired'''
+
+        now = time.time()
+
+        with self.lock:
+            row = self.conn.execute('select body, size, expires from responses where key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+
+            body, size, expires = row
+            if expires is not None and expires < now:
+                self.conn.execute('delete from responses where key = ?', (key,))
+                self.size -= size
+                return None
+
+            self.conn.execute('update responses set accessed = ? where key = ?', (now, key))
+
+        return zlib.decompress(body).decode('utf-8')
+
+    def set(self, key, text, season=None):
+        '''Store a response body, evicting least recently used entries when over max_bytes'''
+
+        now = time.time()
+        ttl = self.ttl(season)
+        body = zlib.compress(text.encode('utf-8'))
+
+        with self.lock:
+            old = self.conn.execute('select size from responses where key = ?', (key,)).fetchone()
+            self.conn.execute('insert or replace into responses values (?, ?, ?, ?, ?)',
+                              (key, body, len(body), None if ttl is None else now + ttl, now))
+            self.size += len(body) - (old[0] if old else 0)
+
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        '''Drop expired responses, then least recently used ones until 90% of max_bytes'''
+
+        self.conn.execute('delete from responses where expires < ?', (time.time(),))
+        self.size = self.conn.execute('select coalesce(sum(size), 0) from responses').fetchone()[0]
+
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute('select key, size from responses order by accessed')
+        evict = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            evict.append((key,))
+            self.size -= size
+
+        self.conn.executemany('delete from responses where key = ?', evict)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('delete from responses')
+            self.size = 0
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,252 @@
+from sqlalchemy import inspect
+import logging
+import time
+import csv
+import io
+
+from ep_data_loader.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+def quote_ident(name):
+    '''Quote a table or column name for postgres'''
+
+    return '"' + str(name).replace('"', '""') + '"'
+
+def create_table_like(df, table, engine):
+    '''Create table with columns typed from the dataframe if it does not exist yet. Concurrent
+    writers (e.g. queue workers) are serialized on an advisory lock so only one creates it.'''
+
+    if inspect(engine).has_table(table):
+        return
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('select pg_advisory_xact_lock(hashtext(%s))', (table,))
+        if not inspect(conn).has_table(table):
+            df.head(0).to_sql(table, conn, index=False)
+
+def copy_to_cursor(df, table, cursor, chunk_size=50000):
+    '''Stream a dataframe into an existing table with COPY ... FROM STDIN in chunks of
+    chunk_size rows. Missing values are written as NULL.'''
+
+    columns = ', '.join(quote_ident(col) for col in df.columns)
+    copy_sql = f'COPY {quote_ident(table)} ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    for start in range(0, len(df), chunk_size):
+        buffer = io.StringIO()
+        df.iloc[start:start + chunk_size].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+
+def copy_dataframe(df, table, engine, chunk_size=50000):
+    '''Append a dataframe to a postgres table using COPY instead of row by row INSERTs.
+    The table is created from the dataframe dtypes when missing and all chunks are written
+    in one transaction.'''
+
+    create_table_like(df, table, engine)
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            copy_to_cursor(df, table, cursor, chunk_size)
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def has_unique_key(table, engine):
+    '''True when table has the natural key index of merge writes, i.e. it was merged into before'''
+
+    with engine.connect() as conn:
+        return conn.exec_driver_sql('select to_regclass(%s)', (quote_ident(f'{table}_natural_key'),)).scalar() is not None
+
+def ensure_unique_key(table, keys, engine):
+    '''Create the unique index ON CONFLICT needs for the natural key of table. Rows appended before
+    the table was first merged can repeat a key, the first time only the latest row of each key (by
+    load_date when the table has one) is kept before the index is built.'''
+
+    index = f'{table}_natural_key'
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('select pg_advisory_xact_lock(hashtext(%s))', (table,))
+        if conn.exec_driver_sql('select to_regclass(%s)', (quote_ident(index),)).scalar() is not None:
+            return
+
+        key_cols = ', '.join(quote_ident(key) for key in keys)
+        has_load_date = conn.exec_driver_sql('''
+            select exists (select 1 from pg_attribute
+                           where attrelid = %s::regclass and attname = 'load_date' and not attisdropped)''',
+            (quote_ident(table),)).scalar()
+        order = 'load_date desc nulls last, ctid desc' if has_load_date else 'ctid desc'
+
+        deleted = conn.exec_driver_sql(f'''
+            delete from {quote_ident(table)} where ctid in (
+                select ctid from (
+                    select ctid, row_number() over (partition by {key_cols} order by {order}) as row_number
+                    from {quote_ident(table)}) ranked
+                where row_number > 1)''').rowcount
+        if deleted:
+            logger.warning('Removed %s duplicate rows of %s before merging on %s', deleted, table, keys,
+                           extra={'table' : table, 'rows' : deleted})
+
+        conn.exec_driver_sql(f'create unique index {quote_ident(index)} on {quote_ident(table)} ({key_cols})')
+
+def ensure_index(table, columns, engine):
+    '''Create a plain index on columns of table if it does not exist yet'''
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('select pg_advisory_xact_lock(hashtext(%s))', (table,))
+        conn.exec_driver_sql(f'create index if not exists {quote_ident(table + "_" + "_".join(columns))} '
+                             f'on {quote_ident(table)} ({", ".join(quote_ident(col) for col in columns)})')
+
+def merge_staging_sql(table, staging, columns, keys, ignore_changes=[]):
+    '''Return the statement merging a staging table into table on its natural keys. Existing rows
+    are only rewritten when a column other than the keys and ignore_changes columns differs.'''
+
+    updates = [quote_ident(col) for col in columns if col not in keys]
+    compared = [quote_ident(col) for col in columns if col not in keys and col not in ignore_changes]
+    columns = [quote_ident(col) for col in columns]
+    key_cols = ', '.join(quote_ident(key) for key in keys)
+
+    merge_sql = f'''
+        insert into {quote_ident(table)} ({", ".join(columns)})
+        select distinct on ({key_cols}) {", ".join(columns)} from {quote_ident(staging)}
+        on conflict ({key_cols}) do '''
+
+    if updates:
+        merge_sql += f'''update set {", ".join(f"{col} = excluded.{col}" for col in updates)}'''
+        if compared:
+            merge_sql += f'''
+        where ({", ".join(f"{quote_ident(table)}.{col}" for col in compared)})
+            is distinct from ({", ".join(f"excluded.{col}" for col in compared)})'''
+    else:
+        merge_sql += 'nothing'
+
+    return merge_sql
+
+def upsert_dataframe(df, table, keys, engine, chunk_size=50000, ignore_changes=['load_date']):
+    '''Merge a dataframe into a postgres table on its natural key. Rows are staged into a temp
+    table with COPY, then inserted with ON CONFLICT DO UPDATE. Existing rows are only rewritten
+    when a column other than the ignore_changes columns differs. Returns the number of rows
+    inserted or updated.'''
+
+    create_table_like(df, table, engine)
+    ensure_unique_key(table, keys, engine)
+
+    staging = quote_ident(f'{table}_staging')
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'create temp table {staging} (like {quote_ident(table)} including defaults) on commit drop')
+            copy_to_cursor(df, f'{table}_staging', cursor, chunk_size)
+            cursor.execute(merge_staging_sql(table, f'{table}_staging', df.columns, keys, ignore_changes))
+            merged = cursor.rowcount
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return merged
+
+def table_columns(table, engine):
+    '''Return the [(column, type)] of a postgres table in column order'''
+
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.exec_driver_sql('''
+            select attname, format_type(atttypid, atttypmod) from pg_attribute
+            where attrelid = %s::regclass and attnum > 0 and not attisdropped
+            order by attnum''', (quote_ident(table),))]
+
+def latest_load_date(table, engine):
+    '''Return the latest load_date of a table, None when the table is missing or empty'''
+
+    if not inspect(engine).has_table(table):
+        return None
+
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f'select max(load_date) from {quote_ident(table)}').scalar()
+
+def replicate_table(table, source, target, since=None, keys=None, chunk_size=50000):
+    '''Stream a table from the source to the target postgres database. Rows are read through a
+    server side cursor chunk_size rows at a time and written with COPY, so memory stays constant
+    whatever the table size. The target table is created with the source column types when missing
+    and gains any column it lacks.
+
+    With since only the rows loaded after it (by load_date) are copied. With keys rows are merged on
+    those natural keys, otherwise they are appended, or replace the target rows when copying the whole
+    table. The target is written in one transaction, an interrupted run leaves it as it was. Returns
+    the number of rows copied.'''
+
+    columns = table_columns(table, source)
+    names = [name for name, type_ in columns]
+
+    with target.begin() as conn:
+        conn.exec_driver_sql('select pg_advisory_xact_lock(hashtext(%s))', (table,))
+        conn.exec_driver_sql(f'''create table if not exists {quote_ident(table)}
+            ({", ".join(f"{quote_ident(name)} {type_}" for name, type_ in columns)})''')
+        for name, type_ in columns:
+            conn.exec_driver_sql(f'alter table {quote_ident(table)} add column if not exists {quote_ident(name)} {type_}')
+
+    if keys:
+        ensure_unique_key(table, keys, target)
+
+    where, params = ('where load_date > %s', (since,)) if since is not None else ('', ())
+    select_sql = f'select {", ".join(map(quote_ident, names))} from {quote_ident(table)} {where}'
+    copy_sql = (f'COPY {quote_ident(f"{table}_staging" if keys else table)} ({", ".join(map(quote_ident, names))}) '
+                f"FROM STDIN WITH (FORMAT csv, NULL '\\N')")
+
+    with source.connect() as conn:
+        total = conn.exec_driver_sql(f'select count(*) from {quote_ident(table)} {where}', params).scalar()
+
+    logger.info('Replicating %s rows of %s%s', total, table, f' loaded after {since}' if since else '',
+                extra={'table' : table, 'rows' : total})
+
+    start = time.time()
+    copied = 0
+    source_conn = source.raw_connection()
+    target_conn = target.raw_connection()
+    try:
+        with source_conn.cursor(name=f'replicate_{table}') as reader, target_conn.cursor() as writer:
+            reader.execute(select_sql, params)
+
+            if keys:
+                writer.execute(f'create temp table {quote_ident(f"{table}_staging")} '
+                               f'(like {quote_ident(table)} including defaults) on commit drop')
+            elif since is None:
+                # delete rather than truncate, readers keep seeing the old rows until the copy commits
+                writer.execute(f'delete from {quote_ident(table)}')
+
+            while True:
+                rows = reader.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                with get_metrics().stage('replicate') as stage:
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows([['\\N' if value is None else value for value in row] for row in rows])
+                    buffer.seek(0)
+                    writer.copy_expert(copy_sql, buffer)
+
+                    if keys:
+                        writer.execute(merge_staging_sql(table, f'{table}_staging', names, keys))
+                        writer.execute(f'truncate table {quote_ident(f"{table}_staging")}')
+                    stage.rows = len(rows)
+
+                copied += len(rows)
+                logger.info('%s: %s/%s rows, %s rows/s', table, copied, total, round(copied / max(time.time() - start, 1e-9)),
+                            extra={'table' : table, 'rows' : copied})
+
+        target_conn.commit()
+    except:
+        target_conn.rollback()
+        raise
+    finally:
+        source_conn.close()
+        target_conn.close()
+
+    return copied
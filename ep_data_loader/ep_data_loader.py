@@ -1,9 +1,9 @@
 from dateutil.relativedelta import relativedelta
 from sqlalchemy import create_engine
 from bs4 import BeautifulSoup
+import lxml.html
 import pandas as pd
 import numpy as np
-import requests
 import datetime
 import argparse
 import time
@@ -12,55 +12,163 @@ import os
 
 import urllib.parse
 import json
-
-from multiprocessing import Pool
+import threading
+import logging
+import asyncio
+import queue
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from ep_data_loader.transport import Transport, get_transport
+from ep_data_loader.db import copy_dataframe, upsert_dataframe, replicate_table, latest_load_date, has_unique_key
+from ep_data_loader.sql import STALE_PLAYER_INFO, CURRENT_SEASON_PLAYERS
+from ep_data_loader.parquet import partition_path, write_parquet
+from ep_data_loader.metrics import get_metrics, configure_logging
+from ep_data_loader.player_index import PlayerIndex
+from ep_data_loader.league_seasons import LeagueSeasons
+from ep_data_loader.team_directory import TeamDirectory
+
+logger = logging.getLogger(__name__)
+
+try:
+    # optional faster html parser for player pages
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
 
 ### eliteprospects url destination
 base_url = 'https://www.eliteprospects.com'
+gql_url = 'https://gql.eliteprospects.com/'
+### persisted graphql query hashes
+persisted_queries = {
+    'LeagueStandingsAndSeasons' : '4f1e610c1de32cb243a476115c040505521fa2038dd3d2a7fd34e0ecd0d0c800',
+    'LeagueTeamComparison' : '7b72c1dc0a2e7e390c7887b9f48369c7749dc5aa4be1168e95f384e87feb21b9',
+    'SkaterStats' : '730d3c8fa9edbcfb2a37f86303688d7a13595d9a0fa11f6167bbef789eaf9e65',
+    'GoaltenderStats' : '8ee15f99f463d0255abff7be71c7342f1705c19cbc1aa6ec5e4c4ded9b4ae146',
+}
+### path of the list of seasons of a league in a LeagueStandingsAndSeasons payload
+league_seasons_path = ['league', 'seasons']
 ### default leagues
 
-### table / database configurations
+### table / database configurations, keys are the natural keys used by merge writes,
+### schema the parquet column types (other columns are written as strings), dtypes the
+### compact in-memory dtypes set on the frames at normalization (see apply_dtypes)
 tables = {
     'team_standing' : {'csv' : 'team_stats',
-                       'postgres' : 'team_stats'},
+                       'postgres' : 'team_stats',
+                       'keys' : ['league', 'teamid', 'season'],
+                       'schema' : {'team' : 'string', 'teamid' : 'string', 'season' : 'string',
+                                   'shortname' : 'string', 'league' : 'string', 'url' : 'string',
+                                   'gp' : 'int32', 'w' : 'int32', 't' : 'int32', 'l' : 'int32',
+                                   'otw' : 'int32', 'otl' : 'int32', 'gf' : 'int32', 'ga' : 'int32',
+                                   'gd' : 'int32', 'tp' : 'int32', 'load_date' : 'timestamp[us]'},
+                       'dtypes' : {'season' : 'category', 'league' : 'category',
+                                   'gp' : 'Int16', 'w' : 'Int16', 't' : 'Int16', 'l' : 'Int16',
+                                   'otw' : 'Int16', 'otl' : 'Int16', 'gf' : 'Int16', 'ga' : 'Int16',
+                                   'gd' : 'Int16', 'tp' : 'Int16'}},
     'skaters' : {'csv' : 'skater_stats',
-                 'postgres' : 'skater_stats'},
+                 'postgres' : 'skater_stats',
+                 'keys' : ['playerid', 'teamid', 'year', 'season_stage'],
+                 'schema' : {'player' : 'string', 'position' : 'string', 'playerid' : 'string',
+                             'url' : 'string', 'shortname' : 'string', 'gp' : 'int32', 'g' : 'int32',
+                             'a' : 'int32', 'tp' : 'int32', 'pim' : 'int32', 'pm' : 'int32',
+                             'season_stage' : 'string', 'gpg' : 'float64', 'apg' : 'float64',
+                             'ppg' : 'float64', 'perc_team_g' : 'float64', 'perc_team_a' : 'float64',
+                             'perc_team_tp' : 'float64', 'year' : 'string', 'team' : 'string',
+                             'teamid' : 'string', 'league' : 'string', 'load_date' : 'timestamp[us]'},
+                 'dtypes' : {'position' : 'category', 'gp' : 'Int16', 'g' : 'Int16', 'a' : 'Int16',
+                             'tp' : 'Int16', 'pim' : 'Int16', 'pm' : 'Int16', 'season_stage' : 'category',
+                             'gpg' : 'float32', 'apg' : 'float32', 'ppg' : 'float32',
+                             'perc_team_g' : 'float32', 'perc_team_a' : 'float32', 'perc_team_tp' : 'float32',
+                             'year' : 'category', 'team' : 'category', 'teamid' : 'category',
+                             'league' : 'category'}},
     'goalies' : {'csv' : 'goalie_stats',
-                 'postgres' : 'goalie_stats'},
+                 'postgres' : 'goalie_stats',
+                 'keys' : ['playerid', 'teamid', 'year', 'season_stage'],
+                 'schema' : {'player' : 'string', 'playerid' : 'string', 'url' : 'string',
+                             'shortname' : 'string', 'gp' : 'int32', 'gaa' : 'float64', 'svp' : 'float64',
+                             'season_stage' : 'string', 'year' : 'string', 'team' : 'string',
+                             'teamid' : 'string', 'league' : 'string', 'load_date' : 'timestamp[us]'},
+                 'dtypes' : {'gp' : 'Int16', 'gaa' : 'float32', 'svp' : 'float32', 'season_stage' : 'category',
+                             'year' : 'category', 'team' : 'category', 'teamid' : 'category',
+                             'league' : 'category'}},
     'player_info' : {'csv' : 'player_info',
-                     'postgres' : 'player_info'},
+                     'postgres' : 'player_info',
+                     'keys' : ['playerid'],
+                     'schema' : {'playerid' : 'string', 'shortname' : 'string', 'date_of_birth' : 'timestamp[us]',
+                                 'place_of_birth' : 'string', 'nation' : 'string', 'position' : 'string',
+                                 'height' : 'int32', 'weight' : 'int32', 'shoots' : 'string',
+                                 'rights' : 'string', 'under_contract' : 'bool',
+                                 'draft_year' : 'string', 'draft_round' : 'string', 'draft_pick' : 'string',
+                                 'draft_team' : 'string', 'draft_year_eligible' : 'int32',
+                                 'load_date' : 'timestamp[us]'},
+                     'dtypes' : {'date_of_birth' : 'datetime64[us]', 'nation' : 'category',
+                                 'position' : 'category', 'height' : 'Int16', 'weight' : 'Int16',
+                                 'shoots' : 'category', 'under_contract' : 'boolean', 'draft_team' : 'category',
+                                 'draft_year_eligible' : 'Int16'}},
          }
 
+def apply_dtypes(df, dtypes):
+    '''Set the declared in-memory dtypes (see tables) on the columns of df that have one.
+    Categoricals are rebuilt after a concat of frames with different categories. Columns that do
+    not convert cleanly (non-numeric or out of range stats) are left as they are, so bad values still
+    show up in the metrics report.'''
+
+    converted = {}
+    for col, dtype in dtypes.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        try:
+            converted[col] = df[col].astype(dtype)
+        except (ValueError, TypeError, OverflowError):
+            continue
+
+    return df.assign(**converted) if converted else df
+
 def get_unique_players(player_stats, goalie_stats):
     '''This function takes skater and goalie stats and returns list of unique
-    dataframe of playerids and player shortnames.
+    dataframe of playerids and player shortnames. Empty stat frames are ignored.
     '''
     player_cols = ['playerid', 'shortname']
 
-    players = pd.concat([player_stats[player_cols].drop_duplicates(player_cols),
-                         goalie_stats[player_cols].drop_duplicates(player_cols)])
+    players = [df[player_cols].drop_duplicates(player_cols) for df in (player_stats, goalie_stats) if not df.empty]
+    if not players:
+        return pd.DataFrame(columns=player_cols)
+
+    players = pd.concat(players)
 
     return players
 
 def get_draft_eligibility(df):
-    '''Return the first year a player is NHL draft eligible'''
+    '''Return the first year a player is NHL draft eligible, missing when the date of birth is'''
 
-    df.set_index('playerid', inplace=True)
+    if 'date_of_birth' not in df:
+        return df.assign(draft_year_eligible = np.nan)
 
-    # create a series filled with valueus of Birth year + 18 on September 15th
-    draft_days = pd.to_datetime(dict(year=df.date_of_birth.dt.year.values + 18,
-                        month=np.full((len(df), ), 9),
-                        day=np.full((len(df), ), 15)))
+    df.set_index('playerid', inplace=True)
 
-    draft_days.index = df.index
+    # check if player will be 18 years old by September 15th of draft year (birth year + 18)
+    born_by_cutoff = (df.date_of_birth.dt.month < 9) | \
+                     ((df.date_of_birth.dt.month == 9) & (df.date_of_birth.dt.day <= 15))
 
-    # check if player will be 18 years old by September 15th of draft year
-    df['draft_year_eligible'] = np.where((draft_days - df['date_of_birth']) / np.timedelta64(1, 'Y') >= 18,
-                                             df.date_of_birth.dt.year.values + 18,
-                                             df.date_of_birth.dt.year.values + 19)
+    df['draft_year_eligible'] = np.where(born_by_cutoff,
+                                         df.date_of_birth.dt.year.values + 18,
+                                         df.date_of_birth.dt.year.values + 19)
 
     return df.reset_index()
 
+def player_info_frame(records):
+    '''Takes a list of player information dictionaries and returns the player_info frame with the
+    columns of the player_info table, whatever facts the pages had, and the draft eligibility set'''
+
+    schema = tables['player_info']['schema']
+    player_info = pd.DataFrame(records).reindex(columns=[col for col in schema if col != 'load_date'])
+    # text columns stay text when no player of the chunk has them, so a table created from it fits later chunks
+    player_info = player_info.astype({col : 'string' for col in player_info if schema[col] == 'string'})
+    player_info['date_of_birth'] = pd.to_datetime(player_info['date_of_birth'], errors='coerce')
+
+    return apply_dtypes(get_draft_eligibility(player_info), tables['player_info']['dtypes'])
+
 def get_current_year(date):
     '''Return hockey season label based on what the current date is'''
     if date.month >= 1 and date.month <= 9:
@@ -88,6 +196,36 @@ def load_db_credentials(prod=False):
 
     return user, password, server, database, port
 
+def create_db_engine(prod=False, **kwargs):
+    '''Create a connection pool to the dev or prod database, kwargs are passed to create_engine'''
+
+    # get db credentials
+    user, password, server, database, port = load_db_credentials(prod)
+
+    return create_engine(f'postgresql+psycopg2://{user}:{password}@{server}:{port}/{database}', **kwargs)
+
+def replicate_tables(source, target, names=None, incremental=False, merge=False, chunk_size=50000):
+    '''Streams the loader tables (see tables, or only names) from the source to the target database,
+    e.g. create_db_engine(prod=False) to create_db_engine(prod=True), chunk_size rows at a time with
+    constant memory (see db.replicate_table). With incremental only the rows loaded after the latest
+    load_date of the target table are copied. With merge rows are upserted on the natural keys, which
+    keeps rows rewritten by merge loads from duplicating, otherwise a full copy replaces the target
+    rows and an incremental one appends them. Returns the number of rows copied per table.
+    '''
+
+    copied = {}
+
+    for config in tables.values():
+        table = config['postgres']
+        if names and table not in names:
+            continue
+
+        since = latest_load_date(table, target) if incremental else None
+        copied[table] = replicate_table(table, source, target, since=since, keys=config['keys'] if merge else None,
+                                        chunk_size=chunk_size)
+
+    return copied
+
 def tidy_player_info(mydict, delete_keys):
     '''Remove keys from dictionary item that certain keys that do not want to be written to database'''
 
@@ -253,6 +391,80 @@ def get_basic_player_info(soup):
 
     return player_info
 
+### start of the player facts section on a player page
+player_facts_re = re.compile(r'<section[^>]*\bid=["\']player-facts["\']')
+
+def get_player_facts_fragment(text):
+    '''Return the html of the player-facts section without parsing the rest of the page,
+    or None when the section cannot be cut out cleanly.'''
+
+    match = player_facts_re.search(text)
+    if match is None:
+        return None
+
+    end = text.find('</section>', match.end())
+    # nested sections would be cut short, leave those to BeautifulSoup
+    if end == -1 or '<section' in text[match.end():end]:
+        return None
+
+    return text[match.start():end + len('</section>')]
+
+def _player_facts_lxml(fragment):
+    '''Player facts key/value pairs from a player-facts fragment using lxml'''
+
+    player_info = {}
+    for details in lxml.html.fragment_fromstring(fragment).iter('li'):
+        span = details.find('.//span')
+        if span is None:
+            return None
+
+        links = details.findall('.//a')
+        player_info[span.text_content().strip()] = ','.join([a.text_content().replace('\n', '').strip() for a in links]) \
+            if links \
+            else details.text_content()[len(span.text_content()):]
+
+    return player_info
+
+def _player_facts_selectolax(fragment):
+    '''Player facts key/value pairs from a player-facts fragment using selectolax'''
+
+    player_info = {}
+    for details in HTMLParser(fragment).css('li'):
+        span = details.css_first('span')
+        if span is None:
+            return None
+
+        links = details.css('a')
+        player_info[span.text().strip()] = ','.join([a.text().replace('\n', '').strip() for a in links]) \
+            if links \
+            else details.text()[len(span.text()):]
+
+    return player_info
+
+player_facts_parsers = {
+    'selectolax' : _player_facts_selectolax,
+    'lxml' : _player_facts_lxml,
+}
+
+def get_fast_player_info(text, parser='auto'):
+    '''Same output as get_basic_player_info, but only the player-facts section of the page is
+    parsed, using selectolax (when installed) or lxml. parser='bs4' or markup that does not match
+    falls back to get_basic_player_info on the full page.'''
+
+    if parser == 'auto':
+        parser = 'selectolax' if HTMLParser is not None else 'lxml'
+
+    player_info = None
+    if parser in player_facts_parsers:
+        fragment = get_player_facts_fragment(text)
+        if fragment is not None:
+            player_info = player_facts_parsers[parser](fragment)
+
+    if not player_info:
+        return get_basic_player_info(BeautifulSoup(text, features="lxml"))
+
+    return clean_player_details(player_info)
+
 def get_add_player_info(soup, player_info):
     '''This function finds player details unlisted div and loops over the line items
     and creates a key/value dictionary containing player additional information. Returns
@@ -281,31 +493,69 @@ def get_add_player_info(soup, player_info):
 
     return {**player_info, **draft_info}
 
-def get_team_league_stats(league, year):
-    '''This function takes a league name and year and retrieves standings and team stats.
-    Returns standings, teamidis and team shorthands to retrieve player roster information.'''
+def gql_cacheable(text):
+    '''True for graphql responses worth caching, those with data and no errors. Errors are sent with
+    a 200 (e.g. an unknown persisted query) and would otherwise be served from the cache for good.'''
 
-    # Define the URL template with placeholders for slug and season
-    url_template = (
-        "https://gql.eliteprospects.com/?operationName=LeagueStandingsAndSeasons"
-        "&variables=%7B%22slug%22%3A%22{slug}%22%2C%22season%22%3A%22{season}%22%2C%22sort%22%3A%22group%2Cposition%22%7D"
-        "&extensions=%7B%22persistedQuery%22%3A%7B%22version%22%3A1%2C%22sha256Hash%22%3A%224f1e610c1de32cb243a476115c040505521fa2038dd3d2a7fd34e0ecd0d0c800%22%7D%7D"
-    )
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return False
 
-    # Format the URL with the given slug and season
-    url = url_template.format(slug=urllib.parse.quote(league.lower()), season=urllib.parse.quote(year))
+    return isinstance(data, dict) and isinstance(data.get('data'), dict) and not data.get('errors')
+
+def get_gql_text(operation, variables, transport=None):
+    '''Requests a persisted graphql query from the elite prospects api through the shared
+    transport and returns the raw json text. Responses are cached by operation name and
+    variables when the transport has a response cache, except responses with errors (see
+    gql_cacheable).'''
+
+    transport = transport or get_transport()
+
+    url = gql_url + '?' + urllib.parse.urlencode({
+        'operationName' : operation,
+        'variables' : json.dumps(variables, separators=(',', ':')),
+        'extensions' : json.dumps({'persistedQuery' : {'version' : 1,
+                                                       'sha256Hash' : persisted_queries[operation]}},
+                                  separators=(',', ':'))})
 
     # Define the necessary headers
     headers = {
         "Content-Type": "application/json",
-        "x-apollo-operation-name": "LeagueStandingsAndSeasons",
+        "x-apollo-operation-name": operation,
         "apollo-require-preflight": "true"
     }
 
     # Make the request with the headers
-    response = requests.get(url, headers=headers)
+    text = transport.get_text(url, headers=headers,
+                              cache_key=f'{operation}:{json.dumps(variables, sort_keys=True)}',
+                              season=variables.get('season'), cacheable=gql_cacheable)
+
+    return text
 
-    data = json.loads(response.text)
+def get_gql(operation, variables, transport=None):
+    '''Requests a persisted graphql query and returns the decoded json payload, see get_gql_text'''
+
+    return json.loads(get_gql_text(operation, variables, transport))
+
+def get_team_gql(operation, year, teamid, league, transport=None, fingerprints=None):
+    '''Requests a team payload for a season and returns the decoded json payload. When payload
+    fingerprints are given returns None if the payload is unchanged since it was last written.'''
+
+    text = get_gql_text(operation, {'team' : teamid, 'season' : year}, transport)
+
+    if fingerprints and not fingerprints.changed(league, year, teamid, operation, text):
+        return None
+
+    return json.loads(text)
+
+def get_team_league_stats(league, year, transport=None):
+    '''This function takes a league name and year and retrieves standings and team stats.
+    Returns standings, teamidis and team shorthands to retrieve player roster information.'''
+
+    data = get_gql('LeagueStandingsAndSeasons',
+                   {'slug' : league.lower(), 'season' : year, 'sort' : 'group,position'},
+                   transport)
 
     columns = ['gp', 'w', 't', 'l', 'otw',
                'otl', 'gf', 'ga', 'gd', 'tp']
@@ -314,7 +564,7 @@ def get_team_league_stats(league, year):
     standings.columns = [col.lower() for col in standings.columns]
 
     if standings.empty:
-        return pd.DataFrame(), [], []
+        return pd.DataFrame(), []
 
     teaminfo = pd.DataFrame([d['team'] for d in data['data']['leagueStandings']])
 
@@ -327,271 +577,376 @@ def get_team_league_stats(league, year):
     teams['league'] = league
     teams['url'] = base_url + '/team/' + teaminfo.eliteprospectsUrlPath + '/' + year
 
-    team_standings = teams.merge(standings[columns], left_index=True, right_index=True)
+    team_standings = apply_dtypes(teams.merge(standings[columns], left_index=True, right_index=True),
+                                  tables['team_standing']['dtypes'])
 
     return team_standings, [(id_, name) for id_, name in zip(team_standings.teamid, team_standings.team)]
 
-def get_skater_stats(year, teamid, team, league):
-    '''This function takes a teamid, team name and year and retrieves team skater stats.
-    Returns skater scoring data after calculating basic metrics.'''
+def extract_league_seasons(data):
+    '''Takes a LeagueStandingsAndSeasons payload and returns the sorted seasons listed under
+    data.league.seasons (season slugs such as '2019-2020', or objects with a slug), None when that
+    list is missing or holds no season.'''
 
+    seasons = data.get('data') if isinstance(data, dict) else None
+    for key in league_seasons_path:
+        seasons = seasons.get(key) if isinstance(seasons, dict) else None
 
-    stat_cols = ['GP', 'G', 'A', 'PTS', 'PIM', 'PM']
-    player_cols = ['player', 'position', 'playerid', 'url', 'shortname']
+    if not isinstance(seasons, list):
+        return None
 
-    # Define the URL template with placeholders for parameters
-    url_template = (
-        "https://gql.eliteprospects.com/?operationName=SkaterStats"
-        "&variables=%7B%22team%22%3A%22{team}%22%2C%22season%22%3A%22{season}%22%7D"
-        "&extensions=%7B%22persistedQuery%22%3A%7B%22version%22%3A1%2C%22sha256Hash%22%3A%22730d3c8fa9edbcfb2a37f86303688d7a13595d9a0fa11f6167bbef789eaf9e65%22%7D%7D"
-    )
+    slugs = set()
+    for season in seasons:
+        slug = season.get('slug') if isinstance(season, dict) else season
+        if isinstance(slug, str) and re.fullmatch(r'\d{4}-\d{4}', slug):
+            slugs.add(slug)
 
+    return sorted(slugs) or None
 
-    # Format the URL with the given parameters
-    url = url_template.format(
-        team=urllib.parse.quote(teamid),
-        season=urllib.parse.quote(year)
-    )
+def get_league_seasons(league, year, transport=None):
+    '''Requests the league standings of a season and returns the seasons the league has data for,
+    see extract_league_seasons. A list ending before the requested season is kept, the league
+    ended or was renamed since. Returns None, so nothing is pruned, when the list has fewer than two
+    seasons or misses the requested season within its range, as it then cannot be the full list.'''
 
-    # Define the necessary headers
-    headers = {
-        "Content-Type": "application/json",
-        "x-apollo-operation-name": "SkaterStats",
-        "apollo-require-preflight": "true"
-    }
+    seasons = extract_league_seasons(get_gql('LeagueStandingsAndSeasons',
+                                             {'slug' : league.lower(), 'season' : year, 'sort' : 'group,position'},
+                                             transport))
 
-    # Make the request with the headers
-    response = requests.get(url, headers=headers)
-    data = json.loads(response.text)
+    if seasons is None or len(seasons) < 2 or (year not in seasons and year < seasons[-1]):
+        return None
 
-    stages = [s for s in data['data']['playerStats']['edges'][0] if 'Stats' in s]
+    return seasons
 
-    players = pd.DataFrame([d['player'] for d in data['data']['playerStats']['edges']])\
-    .rename(columns={'name' : 'player', 'detailedPosition' : 'position'})
-    players['playerid'] = players.eliteprospectsUrlPath.apply(lambda x : x.split('/')[2])
-    players['url'] = base_url + '/player/' + players.eliteprospectsUrlPath
-    players['shortname'] = players.eliteprospectsUrlPath.apply(lambda x : x.split('/')[3])
+def normalize_player_stats(data, stat_cols):
+    '''This function takes a playerStats graphql payload (skaters or goalies) and returns a
+    dataframe with one row per player and season stage played (games played > 0). Values are
+    collected column by column in a single pass over all edges and stages, url paths are split
+    with vectorized string methods and stat dtypes are set once.
+    '''
 
-    player_stats = []
-    for stage in stages:
-        stats = pd.DataFrame(
-            [d[stage] if d[stage] else { col: 0 for col in stat_cols} \
-             for d in data['data']['playerStats']['edges']])\
-                                  .assign(season_stage=stage)\
-                                  .rename(columns={'PTS' : 'TP'})\
-                                  .drop(columns=['__typename'], errors='ignore')
+    edges = data['data']['playerStats']['edges']
+    stages = [s for s in edges[0] if 'Stats' in s]
 
-        stats.columns = [col.lower() for col in stats.columns]
-        # prevent zero divide error and remove all players with 0 games played
-        stats = stats[stats['gp'] > 0]
+    index, season_stages = [], []
+    stats = {col : [] for col in stat_cols}
+    rows = 0
 
-        # calculate metrics for players
-        player_stats.append(calculate_player_metrics(stats))
+    # games played of every player and stage, coerced once as it can come as a string
+    games_played = pd.to_numeric(pd.Series([(edge[stage] or {}).get('GP') for edge in edges for stage in stages],
+                                           dtype=object), errors='coerce').to_numpy()
+    # prevent zero divide error and remove all players with 0 games played
+    played = iter(games_played > 0)
 
-    player_stats = pd.concat(player_stats)
+    for i, edge in enumerate(edges):
+        for stage in stages:
+            line = edge[stage]
+            if not next(played):
+                continue
 
-    player_stats['year'] = year
-    player_stats['team'] = team
-    player_stats['teamid'] = teamid
-    player_stats['league'] = league
+            for key, value in line.items():
+                if key == '__typename':
+                    continue
+                if key not in stats:
+                    stats[key] = [None] * rows
+                stats[key].append(value)
+
+            rows += 1
+            # pad stats this line does not have
+            for values in stats.values():
+                if len(values) < rows:
+                    values.append(None)
+
+            index.append(i)
+            season_stages.append(stage)
+
+    # player columns are split once per player and repeated for each stage played
+    index = np.asarray(index, dtype=np.intp)
+    paths = pd.Series([edge['player']['eliteprospectsUrlPath'] for edge in edges], dtype=object)
+    path_parts = paths.str.split('/', n=4, expand=True)
+
+    columns = {
+        'player' : np.array([edge['player']['name'] for edge in edges], dtype=object)[index],
+        'position' : np.array([edge['player'].get('detailedPosition') for edge in edges], dtype=object)[index],
+        'playerid' : path_parts[2].to_numpy(dtype=object)[index],
+        'url' : (base_url + '/player/' + paths).to_numpy(dtype=object)[index],
+        'shortname' : path_parts[3].to_numpy(dtype=object)[index],
+        }
+
+    for key, values in stats.items():
+        try:
+            values = pd.to_numeric(values)
+        except (ValueError, TypeError):
+            pass
 
-    player_stats = players[player_cols].merge(player_stats, left_index=True, right_index=True)
+        columns['tp' if key == 'PTS' else key.lower()] = values
 
-    return player_stats
+    columns['season_stage'] = season_stages
 
-def get_goalie_stats(year, teamid, team, league):
+    df = pd.DataFrame(columns, index=index)
 
-    '''This function takes a teamid, team name and year and retrieves team goalie stats.
-    Returns goalie scoring data.'''
+    return df
 
-    player_cols = ['player', 'playerid', 'url', 'shortname']
-    stat_cols = ['GP', 'GAA', 'SVP']
+def get_skater_stats(year, teamid, team, league, transport=None, fingerprints=None):
+    '''This function takes a teamid, team name and year and retrieves team skater stats.
+    Returns skater scoring data, metrics are added for the whole league season by
+    calculate_player_metrics. Returns None when the payload is unchanged (see get_team_gql).'''
 
-    # Define the URL template with placeholders for parameters
-    url_template = (
-        "https://gql.eliteprospects.com/?operationName=GoaltenderStats"
-        "&variables=%7B%22team%22%3A%22{team}%22%2C%22season%22%3A%22{season}%22%7D"
-        "&extensions=%7B%22persistedQuery%22%3A%7B%22version%22%3A1%2C%22sha256Hash%22%3A%228ee15f99f463d0255abff7be71c7342f1705c19cbc1aa6ec5e4c4ded9b4ae146%22%7D%7D"
-    )
+    stat_cols = ['GP', 'G', 'A', 'PTS', 'PIM', 'PM']
 
-    # Format the URL with the given parameters
-    url = url_template.format(
-        team=urllib.parse.quote(teamid),
-        season=urllib.parse.quote(year)
-    )
+    data = get_team_gql('SkaterStats', year, teamid, league, transport, fingerprints)
+    if data is None:
+        return None
 
-    # Define the necessary headers
-    headers = {
-        "Content-Type": "application/json",
-        "x-apollo-operation-name": "GoaltenderStats",
-        "apollo-require-preflight": "true"
-    }
+    with get_metrics().stage('normalize') as stage:
+        player_stats = normalize_player_stats(data, stat_cols)
+        stage.rows = len(player_stats)
 
-    # Make the request with the headers
-    response = requests.get(url, headers=headers)
+    player_stats['year'] = year
+    player_stats['team'] = team
+    player_stats['teamid'] = teamid
+    player_stats['league'] = league
 
-    data = json.loads(response.text)
-    stages = [s for s in data['data']['playerStats']['edges'][0] if 'Stats' in s]
+    return apply_dtypes(player_stats, tables['skaters']['dtypes'])
 
-    players = pd.DataFrame([d['player'] for d in data['data']['playerStats']['edges']])\
-    .rename(columns={'name' : 'player'})
-    players['playerid'] = players.eliteprospectsUrlPath.apply(lambda x : x.split('/')[2])
-    players['url'] = base_url + '/player/' + players.eliteprospectsUrlPath
-    players['shortname'] = players.eliteprospectsUrlPath.apply(lambda x : x.split('/')[3])
+def get_goalie_stats(year, teamid, team, league, transport=None, fingerprints=None):
 
-    goalie_stats = []
-    for stage in stages:
-        stats = pd.DataFrame(
-            [d[stage] if d[stage] else { col: 0 for col in stat_cols} \
-             for d in data['data']['playerStats']['edges']])\
-                                  .assign(season_stage=stage)\
-                                  .rename(columns={'PTS' : 'TP'})\
-                                  .drop(columns=['__typename'], errors='ignore')
+    '''This function takes a teamid, team name and year and retrieves team goalie stats.
+    Returns goalie scoring data, or None when the payload is unchanged (see get_team_gql).'''
 
-        stats.columns = [col.lower() for col in stats.columns]
-        # prevent zero divide error and remove all players with 0 games played
-        stats = stats[stats['gp'] > 0]
-        goalie_stats.append(stats)
+    stat_cols = ['GP', 'GAA', 'SVP']
 
-    goalie_stats = pd.concat(goalie_stats)
+    data = get_team_gql('GoaltenderStats', year, teamid, league, transport, fingerprints)
+    if data is None:
+        return None
 
-    goalie_stats = players[player_cols].merge(goalie_stats[stats.columns], left_index=True, right_index=True)
+    with get_metrics().stage('normalize') as stage:
+        goalie_stats = normalize_player_stats(data, stat_cols).drop(columns=['position'])
+        stage.rows = len(goalie_stats)
 
     goalie_stats['year'] = year
     goalie_stats['team'] = team
     goalie_stats['teamid'] = teamid
     goalie_stats['league'] = league
 
-    return goalie_stats
+    return apply_dtypes(goalie_stats, tables['goalies']['dtypes'])
 
-def get_player_stats(year, teamid, teamshort, league):
+def get_player_stats(year, teamid, teamshort, league, transport=None):
     '''This function takes a teamid, team name and year and retrieves team goalie and skater stats.
-    Returns goalie / skater scoring data as a wrapper around individual position functions.'''
-
-    # contruct url
-    url = f'{base_url}/team/{teamid}/{teamshort}/{year}?tab=stats#players'
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, features="lxml")
+    Returns goalie / skater scoring data as a wrapper around individual position functions, or empty
+    frames when the team has no stats.'''
 
     try:
         # get stats from goalies and skaters
-        return get_skater_stats(year, teamid, teamshort, league), get_goalie_stats(year, teamid, teamshort, league)
+        return get_team_player_stats(year, teamid, teamshort, league, transport)
 
     except Exception as e:
-        print(f'\n{year} {teamshort} does not have have proper team stats \n')
-        print('Error: \n', e)
+        logger.warning('%s %s does not have proper team stats: %s', year, teamshort, e,
+                       extra={'league' : league, 'season' : year, 'teamid' : teamid})
         return pd.DataFrame(columns=['player', 'gp', 'g',
                                      'a', 'tp', 'pim', 'pm']), pd.DataFrame(columns=['player', 'gp',
                                                                                      'gaa', 'svp'])
 
+### stat columns used for metrics and the keys identifying a team's season stage
+metric_stat_cols = ['g', 'a', 'tp', 'gp']
+metric_group_cols = ['league', 'teamid', 'year', 'season_stage']
+
 def calculate_player_metrics(df):
-    '''Takes a dataframe containing player stats for a team and calcuates metrics intra-team.
-    Returns points per game, assists per game, goals per game, percent of team points, etc.
+    '''Takes a dataframe containing player stats for any number of teams, seasons and season stages
+    and calcuates metrics intra-team in one grouped pass (grouped by league, teamid, year and
+    season_stage where present). Returns points per game, assists per game, goals per game,
+    percent of team points, etc. Rows with non-numeric stats are reported and left without metrics.
     '''
-    try:
-        # adding metrics
-        df = df.assign(
-            gpg=(df.g.astype(int) / df.gp.astype(int)).round(3),
-            apg=(df.a.astype(int) / df.gp.astype(int)).round(3),
-            ppg=(df.tp.astype(int) / df.gp.astype(int)).round(3),
-            perc_team_g=((df.g.astype(int) / df.gp) / (df.g.astype(int).sum() / df.gp.max())).round(3),
-            perc_team_a=((df.a.astype(int) / df.gp) / (df.a.astype(int).sum() / df.gp.max())).round(3),
-            perc_team_tp=((df.tp.astype(int) / df.gp) / (df.tp.astype(int).sum() / df.gp.max())).round(3))
 
-        return df
+    raw = df
+    df = df.copy()
+
+    # coerce stat columns once, anything non-numeric becomes NaN
+    for col in metric_stat_cols:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    bad = df[metric_stat_cols].isna().any(axis=1) | (df['gp'] <= 0)
+    if bad.any():
+        report_cols = [col for col in ['player', 'playerid', 'team', 'teamid', 'year', 'season_stage']
+                       if col in df.columns]
+        logger.warning('%s skater rows with missing or non-numeric stats, metrics left empty\n%s', bad.sum(),
+                       raw.loc[bad.values, report_cols + metric_stat_cols].to_string(index=False),
+                       extra={'rows' : int(bad.sum())})
+
+    stats = df[metric_stat_cols].astype('float64').where(~bad)
+    keys = [df[col] for col in metric_group_cols if col in df.columns]
+    if keys:
+        teams = stats.groupby(keys, sort=False, observed=True)
+    else:
+        teams = stats.groupby(np.zeros(len(df)))
+
+    team_gp = teams['gp'].transform('max')
+
+    metrics = pd.DataFrame({
+        'gpg' : (stats.g / stats.gp).round(3),
+        'apg' : (stats.a / stats.gp).round(3),
+        'ppg' : (stats.tp / stats.gp).round(3),
+        'perc_team_g' : ((stats.g / stats.gp) / (teams['g'].transform('sum') / team_gp)).round(3),
+        'perc_team_a' : ((stats.a / stats.gp) / (teams['a'].transform('sum') / team_gp)).round(3),
+        'perc_team_tp' : ((stats.tp / stats.gp) / (teams['tp'].transform('sum') / team_gp)).round(3),
+        }, index=df.index)
+
+    # metrics follow the stat columns, ahead of the year / team / league columns
+    df = df.drop(columns=metrics.columns, errors='ignore')
+    position = df.columns.get_loc('season_stage') + 1 if 'season_stage' in df.columns else len(df.columns)
+
+    return pd.concat([df.iloc[:, :position], metrics, df.iloc[:, position:]], axis=1)
+
+def get_league_season_teams(league, year, transport=None, directory=None, standings=True):
+    '''This function takes a league name and year and returns the team standings and the list
+    of (teamid, team) to scrape. Falls back to the team comparison endpoint when a league has no standings.
+    With a team directory the team list is recorded, and known team lists are used without requesting
+    the standings when the league has none or standings=False (empty standings are returned then).
+    '''
 
-    except:
+    entry = directory.get(league, year) if directory is not None else None
+    if entry is not None and (entry[1] != 'standings' or not standings):
+        get_metrics().inc('team_directory_hits_total', source=entry[1])
+        return pd.DataFrame(), entry[0]
+
+    # get league standings for teams
+    team_standings, team_info = get_team_league_stats(league, year, transport)
+    source = 'standings'
+    if team_standings.empty:
+        team_info = get_league_teams(league, year, transport)
+        source = 'team_comparison'
 
-        return df
+    if directory is not None:
+        directory.put(league, year, team_info, source)
 
-def scrape_league_season_stats(league, year):
-    '''This function is a wrapper takes a league name and year and retrieve team league
-    standings data, skater scoring statistics, traditional goalie statistics.
+    return team_standings, team_info
+
+def get_team_player_stats(year, teamid, team, league, transport=None, fingerprints=None):
+    '''This function takes a teamid, team name and year and retrieves skater and goalie stats
+    for a single team, requesting both concurrently. Returns a tuple of skater stats and goalie stats,
+    either is None when its payload is unchanged since the last load (see get_team_gql).
     '''
 
-    print(f'\n--- Getting League Team Stats for {league} {year} --- \n')
-    league_player_stats = []
-    league_goalie_stats = []
-    # get league standings for teams
-    team_standings, team_info = get_team_league_stats(league, year)
-    if team_standings.empty:
-        team_info = get_league_teams(league, year)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        skaters = executor.submit(get_skater_stats, year, teamid, team, league, transport, fingerprints)
+        goalies = executor.submit(get_goalie_stats, year, teamid, team, league, transport, fingerprints)
 
-    # loop over teams to construct player stat tables
-    for teamid, team in team_info:
-        try:
-            print(f'--- Getting Team Player Stats for {team} {teamid} ---')
-            player_stats = get_skater_stats(year, teamid, team, league)
-            goalie_stats = get_goalie_stats(year, teamid, team, league)
+        return skaters.result(), goalies.result()
 
-            league_player_stats.append(player_stats)
-            league_goalie_stats.append(goalie_stats)
-            # space url calls by 2 second each time
-            time.sleep(2)
-        except Exception as e:
-            print(f'\n--- Failed to load {team} {teamid} ---')
-            print(e)
-            continue
+def combine_league_season_stats(league, team_standings, team_results):
+    '''Takes the team standings and the per team (skater, goalie) results of a league season and
+    returns the league level team standings, skater and goalie stats. Failed teams are passed as None,
+    unchanged skater or goalie payloads as None in the team tuple and are left out of the result.
+    '''
 
-    player_stats = pd.concat(league_player_stats, sort=False)
-    goalie_stats = pd.concat(league_goalie_stats, sort=False)
+    team_results = list(filter(None, team_results))
+    if not team_results:
+        raise ValueError(f'No teams loaded for {league}')
+
+    league_player_stats = [players for players, goalies in team_results if players is not None]
+    league_goalie_stats = [goalies for players, goalies in team_results if goalies is not None]
+
+    player_stats = pd.concat(league_player_stats, sort=False) if league_player_stats else pd.DataFrame()
+    goalie_stats = pd.concat(league_goalie_stats, sort=False) if league_goalie_stats else pd.DataFrame()
 
     player_stats = player_stats.assign(league=league)
     goalie_stats = goalie_stats.assign(league=league)
 
-    return team_standings, player_stats, goalie_stats
+    # calculate metrics for every team of the league season at once
+    if not player_stats.empty:
+        with get_metrics().stage('metrics') as stage:
+            player_stats = calculate_player_metrics(player_stats)
+            stage.rows = len(player_stats)
 
-def get_league_teams(league, year):
+    # team categories differ, the concat leaves them as strings
+    return team_standings, apply_dtypes(player_stats, tables['skaters']['dtypes']), \
+        apply_dtypes(goalie_stats, tables['goalies']['dtypes'])
 
-    ''' loop over gql api instead of divs '''
+def select_teams(team_info, teams=None):
+    '''Limit a list of (teamid, team) to the given teamids, all teams when teams is None'''
 
-    url_template = (
-    "https://gql.eliteprospects.com/?operationName=LeagueTeamComparison"
-    "&variables=%7B%22slug%22%3A%22{slug}%22%2C%22season%22%3A%22{season}%22%2C%22sort%22%3A%22team.name%22%7D"
-    "&extensions=%7B%22persistedQuery%22%3A%7B%22version%22%3A1%2C%22sha256Hash%22%3A%227b72c1dc0a2e7e390c7887b9f48369c7749dc5aa4be1168e95f384e87feb21b9%22%7D%7D"
-)
+    if teams is None:
+        return team_info
 
-    # Format the URL with the given slug and season
-    url = url_template.format(slug=urllib.parse.quote(league.lower()), season=urllib.parse.quote(year))
+    teams = set(map(str, teams))
 
-    # Define the necessary headers
-    headers = {
-        "Content-Type": "application/json",
-        "x-apollo-operation-name": "LeagueStandingsAndSeasons",
-        "apollo-require-preflight": "true"
-    }
+    return [(teamid, team) for teamid, team in team_info if str(teamid) in teams]
 
-    # Make the request with the headers
-    response = requests.get(url, headers=headers)
+def scrape_league_season_stats(league, year, transport=None, manifest=None, teams=None, fingerprints=None,
+                               directory=None):
+    '''This function is a wrapper takes a league name and year and retrieve team league
+    standings data, skater scoring statistics, traditional goalie statistics. When a task manifest
+    is given each team is recorded as done or failed, teams limits the load to those teamids (the
+    standings are not needed then). With payload fingerprints teams whose payloads are unchanged are
+    left out of the player stats. The team list comes from the team directory when known.
+    '''
+
+    logger.info('Getting league team stats for %s %s', league, year, extra={'league' : league, 'season' : year})
+    team_results = []
+    # get league standings for teams
+    team_standings, team_info = get_league_season_teams(league, year, transport, directory, standings=teams is None)
+
+    # loop over teams to construct player stat tables
+    for teamid, team in select_teams(team_info, teams):
+        try:
+            logger.debug('Getting team player stats for %s %s', team, teamid)
+            team_results.append(get_team_player_stats(year, teamid, team, league, transport, fingerprints))
+            if manifest:
+                manifest.done(league, year, teamid)
+        except Exception as e:
+            logger.warning('Failed to load %s %s: %s', team, teamid, e,
+                           extra={'league' : league, 'season' : year, 'teamid' : teamid})
+            # the payloads of a failed team are not written, keep them changed for the next run
+            if fingerprints:
+                fingerprints.discard(league, year, teamid)
+            if manifest:
+                manifest.failed(league, year, teamid, e)
+            continue
+
+    return combine_league_season_stats(league, team_standings, team_results)
+
+def get_league_teams(league, year, transport=None):
+
+    ''' loop over gql api instead of divs '''
 
-    data = json.loads(response.text)
+    data = get_gql('LeagueTeamComparison',
+                   {'slug' : league.lower(), 'season' : year, 'sort' : 'team.name'},
+                   transport)
 
     return [(d['team']['id'], d['team']['name']) for d in data['data']['leagueTeamComparison']]
 
-def _scrape_league_season_stats(league, year):
+def _scrape_league_season_stats(league, year, transport=None, directory=None):
     '''This function is a wrapper takes a league name and year without league
     standings data, and returns skater scoring statistics, traditional goalie statistics.
+    The team list comes from the team directory when known.
     '''
 
-    print(f'\n--- Getting League Team Stats for {league} {year} --- \n')
+    logger.info('Getting league team stats for %s %s', league, year, extra={'league' : league, 'season' : year})
     league_player_stats = []
     league_goalie_stats = []
-    # get league standings for teams
-    team_info = get_league_teams(league, year)
+
+    entry = directory.get(league, year) if directory is not None else None
+    if entry is not None:
+        get_metrics().inc('team_directory_hits_total', source=entry[1])
+        team_info = entry[0]
+    else:
+        team_info = get_league_teams(league, year, transport)
+        if directory is not None:
+            directory.put(league, year, team_info, 'team_comparison')
+
+    if not team_info:
+        raise ValueError(f'No teams found for {league} {year}')
 
     # loop over teams to construct player stat tables
     for teamid, teamshort in team_info:
         try:
-            print(f'--- Getting Team Player Stats for {teamshort} {teamid} ---')
-            player_stats, goalie_stats = get_player_stats(year, teamid, teamshort, league)
+            logger.debug('Getting team player stats for %s %s', teamshort, teamid)
+            player_stats, goalie_stats = get_player_stats(year, teamid, teamshort, league, transport)
 
             league_player_stats.append(player_stats)
             league_goalie_stats.append(goalie_stats)
-            # space url calls by 1 second each time
-            time.sleep(2)
         except Exception as e:
-            print(f'\n--- Failed to load {teamshort} {teamid} ---')
-            print(e)
+            logger.warning('Failed to load %s %s: %s', teamshort, teamid, e,
+                           extra={'league' : league, 'season' : year, 'teamid' : teamid})
             continue
 
     player_stats = pd.concat(league_player_stats, sort=False)
@@ -600,39 +955,238 @@ def _scrape_league_season_stats(league, year):
     player_stats = player_stats.assign(league=league)
     goalie_stats = goalie_stats.assign(league=league)
 
-    return player_stats, goalie_stats
+    # calculate metrics for every team of the league season at once
+    with get_metrics().stage('metrics') as stage:
+        player_stats = calculate_player_metrics(player_stats)
+        stage.rows = len(player_stats)
+
+    return apply_dtypes(player_stats, tables['skaters']['dtypes']), apply_dtypes(goalie_stats, tables['goalies']['dtypes'])
+
+def get_player_page(playerid, shortname, transport=None):
+    '''Retrieve the html of a player page'''
+
+    url = f'{base_url}/player/{playerid}/{shortname}'
+
+    return (transport or get_transport()).get_text(url)
+
+def parse_player_info(text, playerid, shortname, parser='auto'):
+    '''Parse a player page and return a dictionary of the player information kept in the
+    player_info table. See get_fast_player_info for the parser options.'''
 
-def get_player_info(playerid, shortname):
+    delete_keys = ['age', 'youth_team', 'agency', 'highlights',
+                   'drafted', 'cap_hit', 'nhl_rights', 'player_type']
+
+    player_info = get_fast_player_info(text, parser)
+    player_info = tidy_player_info(player_info, delete_keys)
+
+    player_info['playerid'] = playerid
+    player_info['shortname'] = shortname
+
+    return player_info
+
+def get_player_info(playerid, shortname, transport=None, parser='auto'):
     ''' This function takes a playerid and player shortname and retrieve all scrapable
     player information from their player page.
     '''
 
+    try:
+        logger.debug('Retrieving player info for %s', shortname)
+
+        text = get_player_page(playerid, shortname, transport)
 
+        return player_info_frame([parse_player_info(text, playerid, shortname, parser)])
+
+    except Exception as e:
+        logger.warning('Failed to get player info for %s: %s', shortname, e, extra={'playerid' : playerid})
+
+def _fetch_player_page(player, transport=None):
+    '''Fetch a player page for collect_player_info, returning the error instead of raising'''
+
+    playerid, shortname = player
     try:
-        print(f'--- Retrieving player info for: {shortname}')
+        return get_player_page(playerid, shortname, transport)
+    except Exception as e:
+        return e
 
-        url = f'{base_url}/player/{playerid}/{shortname}'
-        r = requests.get(url)
-        soup = BeautifulSoup(r.text, features="lxml")
+def _parse_player_page(text, playerid, shortname, parser='auto'):
+    '''Parse a player page for collect_player_info, returning the error instead of raising'''
 
-        delete_keys = ['age', 'youth_team', 'agency', 'highlights',
-                       'drafted', 'cap_hit', 'nhl_rights', 'player_type']
+    try:
+        return parse_player_info(text, playerid, shortname, parser)
+    except Exception as e:
+        return e
+
+def collect_player_info(players, transport=None, max_workers=8, parse_processes=None, chunk_size=500,
+                        parser='auto'):
+    '''This function takes a dataframe of playerids and shortnames and retrieves player information
+    for each player. Player pages are fetched on a pool of max_workers threads and parsed in the
+    calling thread, or on a pool of parse_processes processes when given, with the selected
+    parser (see get_fast_player_info). Yields one
+    (player_info, failed) tuple per chunk of chunk_size players where failed is a list of
+    (playerid, shortname, error).
+    '''
+
+    players = list(zip(players.playerid, players.shortname))
+    parse_pool = ProcessPoolExecutor(max_workers=parse_processes) if parse_processes else None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as fetch_pool:
+            for i in range(0, len(players), chunk_size):
+                chunk = players[i:i + chunk_size]
+                pages = list(fetch_pool.map(lambda player: _fetch_player_page(player, transport), chunk))
 
-        player_info = get_basic_player_info(soup)
-        player_info = tidy_player_info(player_info, delete_keys)
+                failed = [(playerid, shortname, page) for (playerid, shortname), page in zip(chunk, pages)
+                          if isinstance(page, Exception)]
+                fetched = [(page, playerid, shortname, parser) for (playerid, shortname), page in zip(chunk, pages)
+                           if not isinstance(page, Exception)]
 
-        player_info = pd.DataFrame([player_info])
-        player_info['date_of_birth'] = pd.to_datetime(player_info['date_of_birth'])
-        player_info['playerid'] = playerid
-        player_info['shortname'] = shortname
+                with get_metrics().stage('parse_player_page') as stage:
+                    if parse_pool:
+                        parsed = list(parse_pool.map(_parse_player_page, *zip(*fetched), chunksize=16)) if fetched else []
+                    else:
+                        parsed = [_parse_player_page(*args) for args in fetched]
+                    stage.rows = len(parsed)
 
-        # space url calls by 1 second each time
-        time.sleep(0.5)
+                failed += [(playerid, shortname, info) for (page, playerid, shortname, parser), info in zip(fetched, parsed)
+                           if isinstance(info, Exception)]
+                records = [info for info in parsed if not isinstance(info, Exception)]
 
-        return player_info
+                # every chunk has the player_info table columns, even when none of its players had a fact
+                player_info = player_info_frame(records)
 
+                yield player_info, failed
+
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+
+async def _scrape_team_async(league, year, teamid, team, semaphore, executor, transport=None, manifest=None,
+                             fingerprints=None):
+    '''Fetches skater and goalie stats for a team concurrently, each request holding
+    one in-flight slot. Returns None when the team fails to load.'''
+
+    loop = asyncio.get_running_loop()
+
+    async def fetch(func):
+        async with semaphore:
+            return await loop.run_in_executor(executor, func, year, teamid, team, league, transport, fingerprints)
+
+    try:
+        logger.debug('Getting team player stats for %s %s', team, teamid)
+        # wait for both requests so neither records a payload hash after a failure is handled
+        result = tuple(await asyncio.gather(fetch(get_skater_stats), fetch(get_goalie_stats), return_exceptions=True))
+        for item in result:
+            if isinstance(item, Exception):
+                raise item
+        if manifest:
+            manifest.done(league, year, teamid)
+        return result
     except Exception as e:
-        print(f'--- failed to get player info for: {shortname} \n {e}')
+        logger.warning('Failed to load %s %s: %s', team, teamid, e,
+                       extra={'league' : league, 'season' : year, 'teamid' : teamid})
+        # the payloads of a failed team are not written, keep them changed for the next run
+        if fingerprints:
+            fingerprints.discard(league, year, teamid)
+        if manifest:
+            manifest.failed(league, year, teamid, e)
+        return None
+
+async def _scrape_league_season_async(league, year, semaphore, executor, transport=None, manifest=None, teams=None,
+                                      fingerprints=None, directory=None):
+    '''Async version of scrape_league_season_stats. Teams of the league season are
+    fetched concurrently.'''
+
+    loop = asyncio.get_running_loop()
+
+    logger.info('Getting league team stats for %s %s', league, year, extra={'league' : league, 'season' : year})
+    async with semaphore:
+        team_standings, team_info = await loop.run_in_executor(executor, get_league_season_teams,
+                                                               league, year, transport, directory, teams is None)
+
+    team_results = await asyncio.gather(
+        *[_scrape_team_async(league, year, teamid, team, semaphore, executor, transport, manifest, fingerprints)
+          for teamid, team in select_teams(team_info, teams)])
+
+    return combine_league_season_stats(league, team_standings, team_results)
+
+async def _stream_league_seasons_async(league_seasons, results, slots, stop, max_in_flight=8, transport=None,
+                                       manifest=None, teams={}, fingerprints=None, directory=None):
+    '''Scrapes league seasons concurrently and puts (league, year, result) on the results queue as each
+    one completes. A league season is only started once a slot is free, slots are released by the
+    consumer once it is done with a league season. Stops starting league seasons when stop is set.'''
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def scrape(league, year):
+        start = time.perf_counter()
+        try:
+            result = await _scrape_league_season_async(league, year, semaphore, executor, transport, manifest,
+                                                       teams.get((league, year)), fingerprints, directory)
+        except Exception as e:
+            result = e
+        get_metrics().league_season(league, year, time.perf_counter() - start,
+                                    'failed' if isinstance(result, Exception) else 'done')
+        results.put((league, year, result))
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        tasks = []
+        for league, year in league_seasons:
+            await loop.run_in_executor(None, slots.acquire)
+            if stop.is_set():
+                break
+            tasks.append(asyncio.create_task(scrape(league, year)))
+
+        if stop.is_set():
+            for task in tasks:
+                task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def stream_league_seasons_async(league_seasons, max_in_flight=8, transport=None, manifest=None, teams={},
+                                fingerprints=None, max_buffered=4, directory=None):
+    '''This function takes a list of (league, year) pairs and scrapes the league seasons and their
+    teams concurrently, with at most max_in_flight requests running at once, yielding (league, year,
+    result) as soon as each league season completes. result is the (teams, skaters, goalies) tuple
+    returned by scrape_league_season_stats or the exception raised while loading the league season.
+    Teams are recorded in the task manifest when given, teams maps (league, year) to the teamids to
+    load. Unchanged team payloads are skipped when payload fingerprints are given, team lists come
+    from the team directory when given. The event loop runs on a helper thread and at most
+    max_buffered league seasons are being scraped or waiting to be consumed at once, so memory stays
+    bounded however many league seasons are requested.
+    '''
+
+    results = queue.Queue()
+    slots = threading.Semaphore(max_buffered)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            asyncio.run(_stream_league_seasons_async(league_seasons, results, slots, stop, max_in_flight,
+                                                     transport, manifest, teams, fingerprints, directory))
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(None)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            yield item
+            # the league season has been consumed, let the next one start
+            slots.release()
+    finally:
+        stop.set()
+        slots.release()
+        producer.join()
 
 class Scraper(object):
 
@@ -644,7 +1198,17 @@ class Scraper(object):
             'USHS-PREP', 'ECHL', 'Mestis', 'NTDP'],
         start_year = 1985,
         end_year = 2020,
-        prod_db = False
+        prod_db = False,
+        transport = None,
+        cache = None,
+        engine = None,
+        write_mode = 'append',
+        manifest = None,
+        fingerprints = None,
+        report_dir = 'data/reports',
+        player_index = None,
+        league_seasons = None,
+        team_directory = None
         ):
 
         self.leagues = leagues
@@ -652,200 +1216,552 @@ class Scraper(object):
         self.end_year = end_year
         self.seasons = [f'{s}-{s + 1}' for s in range(self.start_year, self.end_year + 1)]
         self.failed_league_seasons = []
+        self.failed_players = []
         self.prod = prod_db
+        # pooled http session shared by every fetcher, see transport.Transport
+        self.transport = transport or (Transport(cache=cache) if cache is not None else get_transport())
+        # persistent response cache, see cache.ResponseCache
+        if cache is not None:
+            self.transport.cache = cache
+        # database engine, created on first use and shared by every write
+        self._engine = engine
+        # 'append' adds rows, 'merge' upserts on the natural keys in tables
+        self.write_mode = write_mode
+        # persistent record of loaded league seasons and teams, see manifest.TaskManifest
+        self.manifest = manifest
+        # content hashes of written team payloads, see fingerprint.PayloadFingerprints
+        self.fingerprints = fingerprints
+        # csv tables written during this run
+        self._csv_started = set()
+        # run reports and prometheus textfile are written here at the end of each load, None to disable
+        self.report_dir = report_dir
+        # playerids in the player_info table, see player_index.PlayerIndex (data/player_index.npz by default)
+        self.player_index = player_index if player_index is not None else PlayerIndex()
+        # seasons each league has data for, see league_seasons.LeagueSeasons (in memory only by default)
+        self.league_seasons = league_seasons if league_seasons is not None else LeagueSeasons(path=None)
+        # teams of each league season, see team_directory.TeamDirectory (in memory only by default)
+        self.team_directory = team_directory if team_directory is not None else TeamDirectory(path=None)
+
+        # progress is logged, show it when the caller has not configured logging (e.g. notebooks)
+        if not logging.getLogger().handlers and not logging.getLogger('ep_data_loader').handlers:
+            configure_logging()
+
+    def get_playerid_delta(self, players, refresh=True):
+        '''Return the players whose information is not in the player_info table yet. The player index
+        is first refreshed with the players loaded since its last refresh, refresh=False uses it as is.'''
+
+        if refresh:
+            self.player_index.refresh(self.engine)
+
+        return self.player_index.unknown(players)
+
+    @property
+    def engine(self):
+        '''Pooled database engine, created once from the database credentials'''
+
+        if self._engine is None:
+            # create a connection pool to the database
+            self._engine = create_db_engine(self.prod, pool_size=4, pool_pre_ping=True)
+
+        return self._engine
+
+    def report_run(self, start):
+        '''Logs the runtime of a load and writes its run report (see metrics.Metrics) to report_dir'''
+
+        logger.info('Runtime : %s mins', round((time.time() - start) / 60, 2))
+
+        if self.report_dir:
+            path = get_metrics().write(self.report_dir)
+            logger.info('Run report written to %s', path)
+
+    def output_to_db(self, df, name, chunk_size=50000, mode=None, touch=False):
+        '''Writes a dataframe to database using the table metadata outlined at script instantiation.
+        Rows are streamed with COPY in chunks of chunk_size rows. mode (defaults to the Scraper
+        write_mode) 'append' adds every row, 'merge' upserts on the table natural keys and only
+        rewrites rows that changed, or every row with touch=True so their load_date is refreshed.'''
+
+        mode = mode or self.write_mode
+        # add a load date field
+        df = df.assign(load_date = datetime.datetime.now())
 
-        # self.engine = engine
+        if mode not in ('merge', 'append'):
+            raise ValueError(f"mode must be 'append' or 'merge', got {mode!r}")
 
-    def get_playerid_delta(self, players):
+        # write the values to the database
+        with get_metrics().stage('write_postgres') as stage:
+            if mode == 'merge':
+                upsert_dataframe(df, tables[name]['postgres'], tables[name]['keys'], self.engine, chunk_size,
+                                 ignore_changes=[] if touch else ['load_date'])
+            else:
+                copy_dataframe(df, tables[name]['postgres'], self.engine, chunk_size)
+            stage.rows = len(df)
+
+    def output_to_csv(self, df, name, append=False):
+        '''Writes a dataframe to csv file using the table metadata outlined at script instantiation.
+        With append=True rows are added to the existing file, aligned to its header. Returns the
+        path written to.'''
 
-        # get db credentials
-        user, password, server, database, port = load_db_credentials(self.prod)
-        # create a connection to the database
-        engine = create_engine(f'postgresql://{user}:{password}@{server}:{port}/{database}')
+        date = datetime.date.today().strftime('%Y-%m-%d')
 
-        player_ids = pd.read_sql('''
-        select
-            distinct playerid
-        from
-            public.player_info
-            ''', self.engine)
+        if not os.path.exists('data'):
+            os.makedirs('data')
 
-        delta_players = players[~players.playerid.astype(int).isin(player_ids.playerid)]
+        table = tables[name]['csv']
+        path = f'data/{table}_{date}.csv'
+
+        with get_metrics().stage('write_csv') as stage:
+            if append and os.path.exists(path):
+                columns = pd.read_csv(path, nrows=0).columns
+                dropped = df.columns.difference(columns)
+                if len(dropped):
+                    logger.warning('Dropping columns not in %s: %s', path, list(dropped))
+
+                df.reindex(columns=columns).to_csv(path, mode='a', header=False, index=False)
+
+            else:
+                # write the values to the csv file
+                df.to_csv(path, index=False)
+            stage.rows = len(df)
+
+        return path
+
+    def output_to_parquet(self, df, name, partitions={}, file='part-0.parquet', root='data/parquet'):
+        '''Writes a dataframe to a zstd compressed parquet file typed with the table schema outlined at
+        script instantiation, under root/{table}/{key}={value}/ for each partition. Partition columns
+        are only stored in the path, so the table reads back as a hive dataset. Rows already in the
+        file are kept unless df has rows with the same natural keys. Returns the path written to.'''
+
+        df = df.assign(load_date = datetime.datetime.now()).drop(columns=list(partitions), errors='ignore')
+        path = partition_path(root, tables[name]['csv'], partitions, file)
+        schema = {col : type_ for col, type_ in tables[name]['schema'].items() if col not in partitions}
+        keys = [key for key in tables[name]['keys'] if key not in partitions]
+
+        with get_metrics().stage('write_parquet') as stage:
+            write_parquet(df, path, schema, keys)
+            stage.rows = len(df)
+
+        return path
+
+    def output_league_season(self, league, year, output='csv', **frames):
+        '''Writes the frames of a league season (team_standing, skaters, goalies) as soon as it is
+        loaded. With output='parquet' each table gets a league / season partition, otherwise csv files
+        are started fresh on the first write of a run and appended to after that. With a task manifest
+        csv files are always appended to so a resumed run adds to the same files. output='postgres'
+        writes the database and the csv files, output='postgres_only' (e.g. for several queue workers on
+        one host) only the database. Returns the paths or tables written to, separated by ;.'''
+
+        paths = []
+        for name, df in frames.items():
+            if df is None or df.empty:
+                continue
+
+            if output == 'parquet':
+                paths.append(self.output_to_parquet(df, name, {'league' : league, 'season' : year}))
+                continue
+
+            if output == 'postgres_only':
+                self.output_to_db(df, name)
+                paths.append(tables[name]['postgres'])
+                continue
+
+            append = self.manifest is not None or name in self._csv_started
+            paths.append(self.output_to_csv(df, name, append=append))
+            self._csv_started.add(name)
 
-        return delta_players
+            if output == 'postgres':
+                self.output_to_db(df, name)
 
-    def output_to_db(self, df, name):
-        '''Writes a dataframe to database using the table metadata outlined at script instantiation'''
+        return ';'.join(paths)
 
-        # get db credentials
-        user, password, server, database, port = load_db_credentials(self.prod)
-        # create a connection to the database
-        engine = create_engine(f'postgresql://{user}:{password}@{server}:{port}/{database}')
-        # add a load date field
-        df = df.assign(load_date = datetime.datetime.now())
-        # write the values to the database
-        df.to_sql(tables[name]['postgres'], engine, if_exists='append', index = False )
+    def load_player_info(self, players, output='csv', max_workers=8, parse_processes=None, chunk_size=500,
+                         parser='auto'):
+        '''Collects player information for a dataframe of playerids and shortnames in parallel and
+        writes each chunk to csv (and postgres, or postgres only with output='postgres_only') as soon as
+        it is parsed. Players that fail are added to self.failed_players. Returns the number of players
+        loaded.'''
 
-    def output_to_csv(self, df, name):
-        '''Writes a dataframe to csv file using the table metadata outlined at script instantiation'''
+        players = players.drop_duplicates('playerid')
+        total = len(players)
+        loaded = 0
+        failed_players = []
+        run = datetime.datetime.now().strftime('%Y-%m-%dT%H%M%S%f')
 
-        date = datetime.date.today().strftime('%Y-%m-%d')
+        logger.info('Retrieving player info for %s players', total, extra={'players' : total})
 
-        if not os.path.exists('data'):
-            os.makedirs('data')
+        for chunk, (player_info, failed) in enumerate(collect_player_info(
+                players, self.transport, max_workers, parse_processes, chunk_size, parser)):
 
-        table = tables[name]['csv']
-        # write the values to the database
-        df.to_csv(f'data/{table}_{date}.csv', index=False)
+            for playerid, shortname, e in failed:
+                logger.warning('Failed to get player info for %s %s: %s', shortname, playerid, e,
+                               extra={'playerid' : playerid})
+            failed_players.extend(failed)
 
-    def full_data_load(self, collect_player_info=False, output='csv'):
+            if output == 'parquet' and not player_info.empty:
+                self.output_to_parquet(player_info, 'player_info', file=f'{run}-{chunk:05d}.parquet')
 
-        '''This function is the main wrapper for a full load of elite prospects data. Leagues and Years
-        are initialized, then looped over to retrieve team league standings, skater/goalie statistics and
-        player information. Will always return a CSV output of the 4 main files and also has functionality
-        to update tables in a postgres database.
+            elif not player_info.empty:
+                if output != 'postgres_only':
+                    self.output_to_csv(player_info, 'player_info', append='player_info' in self._csv_started)
+                    self._csv_started.add('player_info')
+
+                if output in ('postgres', 'postgres_only'):
+                    self.output_to_db(player_info, 'player_info')
+                    self.player_index.add(player_info.playerid, self.engine)
+
+            loaded += len(player_info)
+            logger.info('Player info: %s/%s done, %s failed', loaded + len(failed_players), total, len(failed_players))
+
+        self.failed_players.extend(failed_players)
+
+        return loaded
+
+    def refresh_stale_player_info(self, budget=None, time_budget=None, max_workers=8, parse_processes=None,
+                                  chunk_size=100, parser='auto'):
+        '''Refreshes the player information of current season players whose bio is over a month old
+        (see sql.STALE_PLAYER_INFO), in the query order (draft eligible and youngest players first),
+        then of those with no bio yet (not in the player index). At most budget players are requested
+        and no new chunk of chunk_size players is started after time_budget seconds. Results are
+        appended as the latest row of each player, or merged with their load_date updated when the Scraper write_mode is 'merge' or the
+        table was merged into before, so a player refreshed tonight drops to the end of the queue.
+        Returns the number of players refreshed.
         '''
 
-        # get date time of when script starts
         start = time.time()
+        get_metrics().reset()
 
-        # initialize lists to hold data frames
-        team_stats = []
-        player_stats = []
-        goalie_stats = []
-        player_info = []
+        self.player_index.refresh(self.engine)
+        missing = self.get_playerid_delta(pd.read_sql(CURRENT_SEASON_PLAYERS, self.engine), refresh=False)
+        stale = pd.read_sql(STALE_PLAYER_INFO, self.engine)
 
-        for league in self.leagues:
-            failed_seasons = []
+        players = pd.concat([stale[['playerid', 'shortname']], missing]).drop_duplicates('playerid')
+        if budget is not None:
+            players = players.head(budget)
+
+        refreshed = 0
+        self.failed_players = []
+        # a table merged into before has a unique playerid, its rows are updated instead
+        mode = 'merge' if has_unique_key(tables['player_info']['postgres'], self.engine) else None
+
+        logger.info('Refreshing player info for %s of %s stale and %s missing players', len(players), len(stale),
+                    len(missing))
 
-            for year in self.seasons:
+        for player_info, failed in collect_player_info(players, self.transport, max_workers, parse_processes,
+                                                       chunk_size, parser):
+
+            for playerid, shortname, e in failed:
+                logger.warning('Failed to get player info for %s %s: %s', shortname, playerid, e,
+                               extra={'playerid' : playerid})
+            self.failed_players.extend(failed)
+
+            if not player_info.empty:
+                self.output_to_db(player_info, 'player_info', mode=mode, touch=True)
+                self.player_index.add(player_info.playerid, self.engine)
+
+            refreshed += len(player_info)
+            logger.info('Player info: %s/%s done, %s failed', refreshed + len(self.failed_players), len(players),
+                        len(self.failed_players))
+
+            if time_budget is not None and time.time() - start > time_budget:
+                logger.info('Time budget of %ss used, stopping', time_budget)
+                break
+
+        self.player_index.save()
+        self.report_run(start)
+
+        return refreshed
+
+    def iter_league_season_stats(self, league_seasons, engine='sync', max_in_flight=8, teams={}):
+        '''Scrapes a list of (league, year) pairs with the selected fetch engine. Yields
+        (league, year, result) where result is a (teams, skaters, goalies) tuple or the
+        exception raised while loading the league season. teams maps (league, year) to the
+        teamids to load, all teams are loaded for league seasons not in it.
+        '''
+
+        if engine == 'async':
+            yield from stream_league_seasons_async(league_seasons, max_in_flight, self.transport, self.manifest,
+                                                   teams, self.fingerprints, directory=self.team_directory)
+
+        elif engine == 'sync':
+            for league, year in league_seasons:
+                start = time.perf_counter()
                 try:
-                    # get team, skaters & goalies stats from league page
-                    teams, players, goalies = scrape_league_season_stats(league, year)
-                    team_stats.append(teams)
-                    player_stats.append(players)
-                    goalie_stats.append(goalies)
-
-                    # write data to database after each league season loaded
-                    if output == 'postgres':
-                        self.output_to_db(teams, 'team_standing')
-                        self.output_to_db(players, 'skaters')
-                        self.output_to_db(goalies, 'goalies')
+                    result = scrape_league_season_stats(league, year, self.transport, self.manifest,
+                                                        teams.get((league, year)), self.fingerprints,
+                                                        self.team_directory)
+                except Exception as e:
+                    result = e
+                get_metrics().league_season(league, year, time.perf_counter() - start,
+                                            'failed' if isinstance(result, Exception) else 'done')
+                yield league, year, result
+
+        else:
+            raise ValueError(f"engine must be 'sync' or 'async', got {engine!r}")
+
+    def prune_league_seasons(self, league_seasons):
+        '''Drops the (league, year) pairs of seasons a league has no data for, based on the seasons
+        listed in its standings metadata, fetched once per league and cached in league_seasons.
+        The season right after the latest listed one is kept since the metadata can lag a new season,
+        later ones are dropped as the league ended or was renamed. All the seasons of a league whose
+        metadata could not be loaded are kept.'''
 
+        requested = {}
+        for league, year in league_seasons:
+            requested.setdefault(league, []).append(year)
+
+        available = {}
+        for league, years in requested.items():
+            seasons = self.league_seasons.get(league)
+
+            if seasons is None:
+                try:
+                    seasons = get_league_seasons(league, max(years), self.transport)
                 except Exception as e:
-                    print(e)
+                    logger.warning('Could not load the seasons of %s, keeping all of them: %s', league, e,
+                                   extra={'league' : league})
+                    continue
 
-                    failed_seasons.append(year)
+                if seasons is None:
+                    logger.warning('No complete season list for %s, keeping all of its seasons', league,
+                                   extra={'league' : league})
                     continue
 
-            self.failed_league_seasons.append(
-                {
-                    'league' :league,
-                    'seasons' : failed_seasons
-                    }
-                    )
+                self.league_seasons.put(league, seasons)
+
+            start = int(max(seasons)[:4]) + 1
+            available[league] = set(seasons) | {f'{start}-{start + 1}'}
+
+        kept = [(league, year) for league, year in league_seasons if league not in available or year in available[league]]
+
+        pruned = {}
+        for league, year in set(league_seasons) - set(kept):
+            pruned[league] = pruned.get(league, 0) + 1
+
+        if pruned:
+            get_metrics().inc('league_seasons_pruned_total', sum(pruned.values()))
+            logger.info('Pruned %s of %s league seasons without data: %s', sum(pruned.values()), len(league_seasons),
+                        pruned, extra={'rows' : sum(pruned.values())})
+
+        return kept
+
+    def pending_league_seasons(self, league_seasons):
+        '''Registers league seasons in the task manifest and returns the ones left to load along
+        with a dict of (league, year) to failed teamids for completed league seasons where only
+        some teams failed. Without a manifest every league season is returned.'''
+
+        if self.manifest is None:
+            return league_seasons, {}
+
+        pending = []
+        retry_teams = {}
+
+        for league, year in league_seasons:
+            self.manifest.add(league, year)
+
+            if self.manifest.status(league, year) != 'done':
+                pending.append((league, year))
+                continue
+
+            failed_teams = self.manifest.teams(league, year, 'failed')
+            if failed_teams:
+                pending.append((league, year))
+                retry_teams[(league, year)] = failed_teams
+
+        skipped = len(league_seasons) - len(pending)
+        if skipped:
+            logger.info('Skipping %s league seasons already loaded, %s left (%s only retrying failed teams)',
+                        skipped, len(pending), len(retry_teams))
 
-        team_stats = pd.concat(team_stats, sort=False)
-        player_stats = pd.concat(player_stats, sort=False)
-        goalie_stats = pd.concat(goalie_stats, sort=False)
+        return pending, retry_teams
 
-        # output to csv always
-        self.output_to_csv(team_stats, 'team_standing')
-        self.output_to_csv(player_stats, 'skaters')
-        self.output_to_csv(goalie_stats, 'goalies')
+    def stream_league_seasons(self, league_seasons, output='csv', engine='sync', max_in_flight=8, fallback=False):
+        '''Scrapes (league, year) pairs and writes each league season as soon as it is loaded, yielding
+        (league, year, players) with the unique players of the league season, or None when it failed.
+        Nothing is kept once a league season is yielded. League seasons already done in the task manifest
+        are skipped and only their failed teams are retried, league seasons known to have no teams in the
+        team directory are skipped. With fallback=True league seasons without standings are retried with
+        _scrape_league_season_stats. With payload fingerprints only the teams whose payloads changed are
+        written.'''
 
-        if collect_player_info:
+        if self.fingerprints:
+            self.fingerprints.reset()
 
-            # get player info for skaters and goalies
-            players = get_unique_players(player_stats, goalie_stats)
+        league_seasons, retry_teams = self.pending_league_seasons(league_seasons)
+
+        empty = {(league, year) for league, year in league_seasons if self.team_directory.is_empty(league, year)}
+        if empty:
+            logger.info('Skipping %s league seasons known to have no teams', len(empty), extra={'rows' : len(empty)})
+            league_seasons = [league_season for league_season in league_seasons if league_season not in empty]
+
+        for league, year, result in self.iter_league_season_stats(league_seasons, engine, max_in_flight,
+                                                                  retry_teams):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+
+                # get team, skaters & goalies stats from league page
+                teams, players, goalies = result
+                if (league, year) in retry_teams:
+                    # team standings were written when the league season first loaded
+                    teams = None
+
+            except Exception as e:
+                logger.warning('Failed to load %s %s: %s', league, year, e, extra={'league' : league, 'season' : year})
+
+                if self.fingerprints:
+                    self.fingerprints.discard(league, year)
+
+                if not fallback:
+                    if self.manifest:
+                        self.manifest.failed(league, year, error=e)
+                    yield league, year, None
+                    continue
 
-            for playerid, shortname in zip(players.playerid, players.shortname):
                 try:
-                    player = get_player_info(playerid, shortname)
-                    player_info.append(player)
-                except:
-                    print(f'--- {shortname} bad player data ---')
+                    # some leagues do not have standings
+                    teams = None
+                    players, goalies = _scrape_league_season_stats(league, year, self.transport, self.team_directory)
+                except Exception as e:
+                    logger.warning('%s %s not found: %s', league, year, e, extra={'league' : league, 'season' : year})
+                    if self.manifest:
+                        self.manifest.failed(league, year, error=e)
+                    yield league, year, None
                     continue
 
-            player_info = pd.concat(player_info, sort=False)
-            # gets draft eligibility for all players
-            player_info = get_draft_eligibility(player_info)
-            self.output_to_csv(player_info, 'player_info')
+            # write data after each league season loaded
+            try:
+                location = self.output_league_season(league, year, output, team_standing=teams,
+                                                     skaters=players, goalies=goalies)
+            except:
+                if self.fingerprints:
+                    self.fingerprints.discard(league, year)
+                raise
 
-            if output == 'postgres':
-                self.output_to_db(player_info, 'player_info')
+            if self.fingerprints:
+                self.fingerprints.commit(league, year)
+            if self.manifest:
+                self.manifest.done(league, year, output=location)
+
+            yield league, year, get_unique_players(players, goalies)
+
+        if self.manifest:
+            logger.info('Task manifest: %s', self.manifest.summary())
+        if self.fingerprints:
+            logger.info('Unchanged payloads skipped: %s', self.fingerprints.report())
+
+    def full_data_load(self, collect_player_info=False, output='csv', engine='sync', max_in_flight=8,
+                       **player_info_options):
+
+        '''This function is the main wrapper for a full load of elite prospects data. Leagues and Years
+        are initialized, then looped over to retrieve team league standings, skater/goalie statistics and
+        player information. Returns a CSV output of the 4 main files, or partitioned parquet files with
+        output='parquet', and also has functionality to update tables in a postgres database. With
+        engine='async' league seasons and teams are fetched concurrently with at most max_in_flight requests
+        at once. Each league season is written as soon as it is loaded and player information is collected
+        every chunk_size new players, so memory does not grow with the number of league seasons. With a
+        task manifest a restarted load skips the league seasons already done. Seasons a league has no
+        data for are pruned before any stats are requested, see prune_league_seasons. Extra keyword
+        arguments (max_workers, parse_processes, chunk_size, parser) are passed to load_player_info.
+        '''
+
+        # get date time of when script starts
+        start = time.time()
+        get_metrics().reset()
+
+        league_seasons = self.prune_league_seasons([(league, year) for league in self.leagues for year in self.seasons])
+        failed_seasons = {league : [] for league in self.leagues}
+        chunk_size = player_info_options.get('chunk_size', 500)
+        self.failed_players = []
+
+        # players seen in this run and players waiting for their player information
+        seen = set()
+        batch = []
+
+        for league, year, players in self.stream_league_seasons(league_seasons, output, engine, max_in_flight):
+            if players is None:
+                failed_seasons[league].append(year)
+                continue
 
-        print('Runtime : {} mins'.format(round((time.time() - start) / 60 ,2)))
-        print('Re-run the following league seasons: ', self.failed_league_seasons)
+            if collect_player_info:
+                batch.append(players[~players.playerid.isin(seen)])
+                seen.update(players.playerid)
 
-    def delta_data_load(self, failed_league_seasons=[], output='csv'):
+                if sum(map(len, batch)) >= chunk_size:
+                    # get player info for skaters and goalies
+                    self.load_player_info(pd.concat(batch), output, **player_info_options)
+                    batch = []
+
+        if batch:
+            self.load_player_info(pd.concat(batch), output, **player_info_options)
+
+        for league in self.leagues:
+            self.failed_league_seasons.append(
+                {
+                    'league' :league,
+                    'seasons' : failed_seasons[league]
+                    }
+                    )
+
+        self.player_index.save()
+        self.report_run(start)
+        logger.info('Re-run the following league seasons: %s', self.failed_league_seasons)
+
+    def delta_data_load(self, failed_league_seasons=[], output='csv', engine='sync', max_in_flight=8,
+                        **player_info_options):
 
         '''This function is the main wrapper for a delta load of elite prospects data. Leagues and Years
         are passed to the function, then looped over to retrieve team league standings, skater/goalie statistics and
-        player information. Will always return a CSV output of the 4 main files and also has functionality
-        to update tables in a postgres database.
+        player information. Returns a CSV output of the 4 main files, or partitioned parquet files with
+        output='parquet', and also has functionality to update tables in a postgres database. With
+        engine='async' league seasons and teams are fetched concurrently with at most max_in_flight requests
+        at once. Player information for new players is collected in parallel every chunk_size new players,
+        extra keyword arguments (max_workers, parse_processes, chunk_size, parser) are passed to
+        load_player_info. With a task manifest and no failed_league_seasons the league seasons
+        that failed in the manifest are re-run, seasons a league has no data for are pruned. New players
+        are found with the player index, refreshed once from the database at the start of the load and
+        kept current with the players loaded during it.
         '''
 
         # get date time of when script starts
         start = time.time()
+        get_metrics().reset()
 
-        # initialize lists to hold data frames
-        team_stats = []
-        player_stats = []
-        goalie_stats = []
-        player_info = []
+        league_seasons = [(league_seasons['league'], year)
+                          for league_seasons in failed_league_seasons
+                          for year in league_seasons['seasons']]
 
-        for league_seasons in failed_league_seasons:
-            for year in league_seasons['seasons']:
-                try:
-                    # get team, skaters & goalies stats from league page
-                    teams, players, goalies = scrape_league_season_stats(league_seasons['league'], year)
-                    team_stats.append(teams)
-                    player_stats.append(players)
-                    goalie_stats.append(goalies)
-
-                    # write data to database after each league season loaded
-                    if output == 'postgres':
-                        self.output_to_db(teams, 'team_standing')
-                        self.output_to_db(players, 'skaters')
-                        self.output_to_db(goalies, 'goalies')
+        if not league_seasons and self.manifest is not None:
+            league_seasons = self.manifest.league_seasons('failed')
 
-                except Exception as e:
-                    print(e)
-                    try:
-                        # some leagues do not have standings
-                        players, goalies = _scrape_league_season_stats(league_seasons['league'], year)
-                        player_stats.append(players)
-                        goalie_stats.append(goalies)
+        league_seasons = self.prune_league_seasons(league_seasons)
 
-                        # write data to database after each league season loaded
-                        if output == 'postgres':
-                            self.output_to_db(teams, 'team_standing')
-                            self.output_to_db(players, 'skaters')
-                            self.output_to_db(goalies, 'goalies')
-                    except Exception as e:
-                        print(f"\n---{league_seasons['league']} {year} not found---\n")
-                        print(e)
-                        continue
+        chunk_size = player_info_options.get('chunk_size', 500)
+        self.failed_players = []
 
-        team_stats = pd.concat(team_stats, sort=False)
-        player_stats = pd.concat(player_stats, sort=False)
-        goalie_stats = pd.concat(goalie_stats, sort=False)
+        added = self.player_index.refresh(self.engine)
+        logger.info('Player index: %s known players, %s added since the last load', len(self.player_index), added)
 
-        ### retrieve player information by finding the unique / delta players names
-        players = get_unique_players(player_stats, goalie_stats)
+        # players seen in this run and players waiting for their player information
+        seen = set()
+        batch = []
 
-        delta_players = self.get_playerid_delta(players)
+        for league, year, players in self.stream_league_seasons(league_seasons, output, engine, max_in_flight,
+                                                                fallback=True):
+            if players is None:
+                continue
 
-        with Pool(processes=8) as pool:
-            pool.starmap(get_player_info, zip(delta_players.playerid, delta_players.shortname))
+            batch.append(players[~players.playerid.isin(seen)])
+            seen.update(players.playerid)
 
-        player_info = pd.concat(player_info, sort=False)
+            if sum(map(len, batch)) >= chunk_size:
+                ### retrieve player information by finding the unique / delta players names
+                delta_players = self.get_playerid_delta(pd.concat(batch), refresh=False)
+                batch = []
 
-        player_info = get_draft_eligibility(player_info)
-        self.output_to_csv(player_info, 'player_info')
+                self.load_player_info(delta_players, output, **player_info_options)
 
-        if output == 'postgres':
-            self.output_to_db(player_info, 'player_info')
+        if batch:
+            self.load_player_info(self.get_playerid_delta(pd.concat(batch), refresh=False), output,
+                                  **player_info_options)
 
-        print('Runtime : {} mins'.format(round((time.time() - start) / 60 ,2)))
+        self.player_index.save()
+        self.report_run(start)
@@ -0,0 +1,94 @@
+from collections import Counter
+import threading
+import hashlib
+import time
+
+from ep_data_loader.sqlite_store import connect
+
+class PayloadFingerprints(object):
+    '''Content hashes of the api payloads loaded for each (league, season, team, operation),
+    stored in a SQLite file. A payload identical to the one last written is reported as unchanged
+    so its normalization and writes can be skipped.
+
+    New hashes are held back until commit(league, season) is called once the league season has
+    been written, a load that fails before writing re-processes the payloads on the next run.
+    '''
+
+    def __init__(self, path='data/fingerprints.sqlite'):
+
+        self.path = path
+        self.lock = threading.Lock()
+        # hashes of changed payloads waiting for their league season to be written
+        self.pending = {}
+        # payloads seen and skipped during this run, by operation
+        self.checked = Counter()
+        self.skipped = Counter()
+
+        self.conn = connect(path, '''
+            create table if not exists fingerprints (
+                league text not null,
+                season text not null,
+                team text not null,
+                operation text not null,
+                digest text not null,
+                updated real not null,
+                primary key (league, season, team, operation)
+            )''')
+
+    def changed(self, league, season, team, operation, text):
+        '''Return True when the payload differs from the one last committed for this key'''
+
+        key = (league, season, str(team), operation)
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+        with self.lock:
+            row = self.conn.execute('select digest from fingerprints where league = ? and season = ? '
+                                    'and team = ? and operation = ?', key).fetchone()
+            self.checked[operation] += 1
+
+            if row and row[0] == digest:
+                self.skipped[operation] += 1
+                return False
+
+            self.pending[key] = digest
+
+        return True
+
+    def commit(self, league, season):
+        '''Store the hashes of the changed payloads of a league season after it has been written'''
+
+        with self.lock:
+            keys = [key for key in self.pending if key[:2] == (league, season)]
+            self.conn.executemany('insert or replace into fingerprints values (?, ?, ?, ?, ?, ?)',
+                                  [key + (self.pending.pop(key), time.time()) for key in keys])
+
+    def discard(self, league, season, team=None):
+        '''Forget the pending hashes of a league season that failed to load or write, or only those
+        of one of its teams when team is given'''
+
+        with self.lock:
+            for key in [key for key in self.pending
+                        if key[:2] == (league, season) and (team is None or key[2] == str(team))]:
+                del self.pending[key]
+
+    def report(self):
+        '''Return payloads checked and skipped as unchanged during this run, by operation'''
+
+        with self.lock:
+            return {operation : {'checked' : self.checked[operation], 'skipped' : self.skipped[operation]}
+                    for operation in self.checked}
+
+    def reset(self):
+        '''Start a new run report'''
+
+        with self.lock:
+            self.checked.clear()
+            self.skipped.clear()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('delete from fingerprints')
+            self.pending.clear()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,49 @@
+import datetime
+import threading
+import json
+import time
+
+from ep_data_loader.sqlite_store import connect
+
+class LeagueSeasons(object):
+    '''Seasons each league has data for, as listed in the season metadata of the league
+    standings payload, stored in a SQLite file (path=None keeps them in memory only). Entries
+    older than max_age are treated as missing so seasons added since are picked up.
+    '''
+
+    def __init__(self, path='data/league_metadata.sqlite', max_age=datetime.timedelta(days=7)):
+
+        self.path = path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+        self.conn = connect(path, '''
+            create table if not exists league_seasons (
+                league text primary key,
+                seasons text not null,
+                updated real not null
+            )''')
+
+    def get(self, league):
+        '''Return the sorted seasons of a league, None when unknown or expired'''
+
+        with self.lock:
+            row = self.conn.execute('select seasons, updated from league_seasons where league = ?',
+                                    (league,)).fetchone()
+
+        if row is None or time.time() - row[1] > self.max_age.total_seconds():
+            return None
+
+        return json.loads(row[0])
+
+    def put(self, league, seasons):
+        with self.lock:
+            self.conn.execute('insert or replace into league_seasons values (?, ?, ?)',
+                              (league, json.dumps(sorted(seasons)), time.time()))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('delete from league_seasons')
+
+    def close(self):
+        self.conn.close()
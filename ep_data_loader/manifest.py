@@ -0,0 +1,98 @@
+import threading
+import time
+
+from ep_data_loader.sqlite_store import connect
+
+class TaskManifest(object):
+    '''Persistent record of the units of a load stored in a SQLite file. A unit is a league season
+    (team '') or a team of a league season and is either pending, done or failed. Done league
+    seasons keep the location their output was written to, so a restarted load can skip them and
+    only retry what is left.
+    '''
+
+    def __init__(self, path='data/manifest.sqlite'):
+
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.conn = connect(path, '''
+            create table if not exists tasks (
+                league text not null,
+                season text not null,
+                team text not null default '',
+                status text not null,
+                output text,
+                error text,
+                attempts integer not null default 0,
+                updated real not null,
+                primary key (league, season, team)
+            )''')
+
+    def add(self, league, season, team=''):
+        '''Register a unit as pending unless it is already known'''
+
+        with self.lock:
+            self.conn.execute("insert or ignore into tasks (league, season, team, status, updated) "
+                              "values (?, ?, ?, 'pending', ?)", (league, season, str(team), time.time()))
+
+    def _mark(self, league, season, team, status, output=None, error=None):
+        with self.lock:
+            self.conn.execute('''
+                insert into tasks (league, season, team, status, output, error, attempts, updated)
+                values (?, ?, ?, ?, ?, ?, 1, ?)
+                on conflict (league, season, team) do update set
+                    status = excluded.status,
+                    output = coalesce(excluded.output, output),
+                    error = excluded.error,
+                    attempts = attempts + 1,
+                    updated = excluded.updated''',
+                (league, season, str(team), status, output, error, time.time()))
+
+    def done(self, league, season, team='', output=None):
+        self._mark(league, season, team, 'done', output=output)
+
+    def failed(self, league, season, team='', error=None):
+        self._mark(league, season, team, 'failed', error=None if error is None else str(error))
+
+    def status(self, league, season, team=''):
+        '''Return the status of a unit or None when it is unknown'''
+
+        with self.lock:
+            row = self.conn.execute('select status from tasks where league = ? and season = ? and team = ?',
+                                    (league, season, str(team))).fetchone()
+
+        return row[0] if row else None
+
+    def teams(self, league, season, status='failed'):
+        '''Return the teams of a league season with the given status'''
+
+        with self.lock:
+            rows = self.conn.execute("select team from tasks where league = ? and season = ? and team != '' "
+                                     "and status = ?", (league, season, status)).fetchall()
+
+        return [row[0] for row in rows]
+
+    def league_seasons(self, status):
+        '''Return (league, season) of the league season units with the given status'''
+
+        with self.lock:
+            rows = self.conn.execute("select league, season from tasks where team = '' and status = ? "
+                                     "order by league, season", (status,)).fetchall()
+
+        return [tuple(row) for row in rows]
+
+    def summary(self):
+        '''Return unit counts by status for league seasons and teams'''
+
+        with self.lock:
+            rows = self.conn.execute("select case when team = '' then 'league_seasons' else 'teams' end, "
+                                     "status, count(*) from tasks group by 1, 2").fetchall()
+
+        summary = {'league_seasons' : {}, 'teams' : {}}
+        for unit, status, count in rows:
+            summary[unit][status] = count
+
+        return summary
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,254 @@
+from contextlib import contextmanager
+import threading
+import datetime
+import logging
+import json
+import time
+import os
+
+### histogram upper bounds in seconds for request latencies and stage timings
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+
+class Histogram(object):
+    '''Cumulative histogram with fixed upper bounds, like a prometheus histogram'''
+
+    def __init__(self, buckets=latency_buckets):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        '''Estimate a quantile by linear interpolation inside the bucket holding it'''
+
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+
+        return self.max
+
+    def summary(self):
+        return {'count' : self.count, 'sum' : round(self.sum, 4),
+                'mean' : round(self.sum / self.count, 4) if self.count else None,
+                'p50' : _round(self.quantile(0.5)), 'p95' : _round(self.quantile(0.95)),
+                'max' : round(self.max, 4)}
+
+def _round(value):
+    return None if value is None else round(value, 4)
+
+class Metrics(object):
+    '''Thread safe registry of the counters and histograms recorded by the fetchers, parsers and
+    writers during a run. Exported as a json run report or a prometheus textfile.
+
+    Metrics recorded:
+        http_requests_total{host, status}       requests made, by response status or error
+        http_request_seconds{host}              request latency histogram
+        http_response_bytes_total{host}         bytes received
+        http_retries_total{host, reason}        retried requests
+        http_cache_hits_total                   responses served from the response cache
+        stage_seconds{stage}                    time spent per stage (fetch, normalize, metrics, parse, write_*)
+        stage_rows_total{stage}                 rows produced or written per stage
+        league_season_seconds{status}           league season durations
+        league_seasons_pruned_total             league seasons skipped as the league has no data for them
+        team_directory_hits_total{source}       team lists served from the team directory
+    '''
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Start a new run'''
+
+        with self.lock:
+            self.started = time.time()
+            self.counters = {}
+            self.histograms = {}
+            self.league_seasons = []
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def stage(self, stage):
+        '''Time a block of a stage, set .rows on the yielded record to count the rows it produced'''
+
+        record = StageRecord()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+            if record.rows:
+                self.inc('stage_rows_total', record.rows, stage=stage)
+
+    def league_season(self, league, season, seconds, status):
+        '''Record how long a league season took to load and write'''
+
+        self.observe('league_season_seconds', seconds, status=status)
+        with self.lock:
+            self.league_seasons.append({'league' : league, 'season' : season,
+                                        'seconds' : round(seconds, 3), 'status' : status})
+
+    def report(self):
+        '''Return the run report as a json serializable dict'''
+
+        with self.lock:
+            requests = {}
+            for (name, labels), value in self.counters.items():
+                labels = dict(labels)
+                if not name.startswith('http_') or 'host' not in labels:
+                    continue
+                host = requests.setdefault(labels['host'], {'requests' : 0, 'errors' : 0, 'retries' : 0, 'bytes' : 0})
+                if name == 'http_requests_total':
+                    host['requests'] += value
+                    if not str(labels['status']).startswith('2'):
+                        host['errors'] += value
+                elif name == 'http_retries_total':
+                    host['retries'] += value
+                elif name == 'http_response_bytes_total':
+                    host['bytes'] += value
+
+            for (name, labels), histogram in self.histograms.items():
+                labels = dict(labels)
+                if name == 'http_request_seconds':
+                    requests.setdefault(labels['host'], {})['latency_seconds'] = histogram.summary()
+
+            stages = {}
+            for (name, labels), histogram in self.histograms.items():
+                if name == 'stage_seconds':
+                    stage = dict(labels)['stage']
+                    rows = self.counters.get(('stage_rows_total', (('stage', stage),)), 0)
+                    stages[stage] = {'calls' : histogram.count, 'seconds' : round(histogram.sum, 3), 'rows' : rows,
+                                     'rows_per_sec' : round(rows / histogram.sum, 1) if histogram.sum and rows else None,
+                                     'latency_seconds' : histogram.summary()}
+
+            return {
+                'started' : datetime.datetime.fromtimestamp(self.started).isoformat(),
+                'seconds' : round(time.time() - self.started, 3),
+                'requests' : requests,
+                'cache_hits' : self.counters.get(('http_cache_hits_total', ()), 0),
+                'league_seasons_pruned' : self.counters.get(('league_seasons_pruned_total', ()), 0),
+                'stages' : stages,
+                'league_seasons' : list(self.league_seasons),
+            }
+
+    def prometheus(self, prefix='ep_data_loader_'):
+        '''Return the metrics in the prometheus text exposition format'''
+
+        def labels_text(labels, extra=()):
+            labels = list(labels) + list(extra)
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{str(value)}"' for key, value in labels) + '}'
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, labels in self.counters}):
+                lines.append(f'# TYPE {prefix}{name} counter')
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f'{prefix}{name}{labels_text(labels)} {value}')
+
+            for name in sorted({name for name, labels in self.histograms}):
+                lines.append(f'# TYPE {prefix}{name} histogram')
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append(f'{prefix}{name}_bucket{labels_text(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{prefix}{name}_sum{labels_text(labels)} {histogram.sum}')
+                    lines.append(f'{prefix}{name}_count{labels_text(labels)} {histogram.count}')
+
+            lines.append(f'# TYPE {prefix}last_run_timestamp_seconds gauge')
+            lines.append(f'{prefix}last_run_timestamp_seconds {self.started}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, directory='data/reports', name='ep_data_loader'):
+        '''Write the json run report to directory/{name}_{timestamp}.json and the prometheus textfile
+        to directory/{name}.prom (atomically, for the node exporter textfile collector). Returns the
+        report path.'''
+
+        os.makedirs(directory, exist_ok=True)
+
+        stamp = datetime.datetime.fromtimestamp(self.started).strftime('%Y-%m-%dT%H%M%S')
+        report_path = os.path.join(directory, f'{name}_{stamp}.json')
+        with open(report_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+        prom_path = os.path.join(directory, f'{name}.prom')
+        with open(prom_path + '.tmp', 'w') as f:
+            f.write(self.prometheus())
+        os.replace(prom_path + '.tmp', prom_path)
+
+        return report_path
+
+class StageRecord(object):
+    rows = 0
+
+_default_metrics = Metrics()
+
+def get_metrics():
+    '''Return the process wide metrics registry'''
+
+    return _default_metrics
+
+class JsonFormatter(logging.Formatter):
+    '''Formats log records as one json object per line, extra fields included'''
+
+    fields = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {'time' : self.formatTime(record), 'level' : record.levelname,
+                 'logger' : record.name, 'message' : record.getMessage()}
+        entry.update({key : value for key, value in vars(record).items() if key not in self.fields})
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+def configure_logging(level=logging.INFO, json_logs=False):
+    '''Send the ep_data_loader logs to stderr, as plain text or one json object per line'''
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_logs else
+                         logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    logger = logging.getLogger('ep_data_loader')
+    logger.handlers = [handler]
+    logger.setLevel(level)
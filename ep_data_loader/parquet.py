@@ -0,0 +1,73 @@
+import pandas as pd
+import os
+
+try:
+    # optional dependency for output='parquet'
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+### numeric arrow types, values that are not numbers are written as nulls
+numeric_types = ['int16', 'int32', 'int64', 'float32', 'float64']
+
+def arrow_schema(df, schema):
+    '''Return the arrow schema for a dataframe from a {column : arrow type alias} dict. Columns
+    missing from the dict are typed as string so every column is kept.'''
+
+    columns = list(schema) + [col for col in df.columns if col not in schema]
+
+    return pa.schema([(col, pa.type_for_alias(schema.get(col, 'string'))) for col in columns])
+
+def to_arrow(df, schema):
+    '''Convert a dataframe to an arrow table with an explicit schema. Numeric columns are coerced
+    to numbers, booleans to nullable booleans, every other column to strings and missing schema
+    columns are added as nulls.'''
+
+    if pa is None:
+        raise ImportError("output='parquet' requires pyarrow, pip install pyarrow")
+
+    schema = arrow_schema(df, schema)
+    df = df.reindex(columns=schema.names)
+
+    for field in schema:
+        alias = str(field.type)
+        if alias in numeric_types:
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+        elif alias.startswith('timestamp'):
+            df[field.name] = pd.to_datetime(df[field.name], errors='coerce')
+        elif alias == 'bool':
+            df[field.name] = df[field.name].astype('boolean')
+        else:
+            df[field.name] = df[field.name].astype('string')
+
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def partition_path(root, table, partitions={}, file='part-0.parquet'):
+    '''Return the path of a hive style partition file, e.g. root/table/league=OHL/season=2019-2020/part-0.parquet'''
+
+    return os.path.join(root, table, *[f'{key}={value}' for key, value in partitions.items()], file)
+
+def write_parquet(df, path, schema, keys=None, compression='zstd'):
+    '''Write a dataframe to a compressed parquet file with an explicit schema. With keys, rows of
+    an existing file whose keys are not in df are kept, so a partition can be written team by team
+    like a merge write. The file is replaced atomically. Returns the path written to.'''
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    table = to_arrow(df, schema)
+
+    if keys and os.path.exists(path):
+        existing = pq.read_table(path)
+        new_keys = pd.MultiIndex.from_frame(table.select(keys).to_pandas().astype('string'))
+        old_keys = pd.MultiIndex.from_frame(existing.select(keys).to_pandas().astype('string'))
+
+        kept = existing.filter(pa.array(~old_keys.isin(new_keys)))
+        table = pa.concat_tables([kept, table], promote_options='permissive')
+
+    tmp = path + '.tmp'
+    pq.write_table(table, tmp, compression=compression)
+    os.replace(tmp, path)
+
+    return path
@@ -0,0 +1,153 @@
+from sqlalchemy import inspect, text
+import pandas as pd
+import numpy as np
+import threading
+import datetime
+import logging
+import os
+
+from ep_data_loader.db import quote_ident, ensure_index
+
+logger = logging.getLogger(__name__)
+
+class PlayerIndex(object):
+    '''Sorted array of the playerids in the player_info table, used to find the players whose
+    information has not been loaded yet without reading the whole table. Cached in a local .npz file
+    (path=None keeps it in memory only) along with a watermark, the latest load_date seen.
+
+    refresh only reads the rows loaded since the watermark, less an overlap window covering writes
+    that were stamped before the watermark but committed after it. Players loaded by this process
+    are added directly with add. Membership of a batch of players is a binary search. The index
+    remembers the database it was built from and starts over when refreshed from or added to for
+    another one, or when the table no longer exists.
+    '''
+
+    def __init__(self, path='data/player_index.npz', overlap=datetime.timedelta(minutes=30)):
+
+        self.path = path
+        self.overlap = overlap
+        self.lock = threading.Lock()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.watermark = None
+        self.database = None
+
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                self.ids = data['ids']
+                watermark = data['watermark'][()]
+                if not np.isnat(watermark):
+                    self.watermark = pd.Timestamp(watermark).to_pydatetime()
+                if 'database' in data.files:
+                    self.database = str(data['database'][()]) or None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, playerid):
+        return bool(self.contains([playerid])[0])
+
+    def contains(self, playerids):
+        '''Return a boolean array, True for the playerids in the index. Non-numeric ids are never in it.'''
+
+        ids = _as_ids(playerids)
+        with self.lock:
+            index = self.ids
+
+        position = np.searchsorted(index, ids)
+        found = np.zeros(len(ids), dtype=bool)
+        inside = position < len(index)
+        found[inside] = index[position[inside]] == ids[inside]
+
+        return found
+
+    def unknown(self, players):
+        '''Return the rows of a players dataframe (with a playerid column) that are not in the index'''
+
+        return players[~self.contains(players.playerid)]
+
+    def add(self, playerids, engine=None):
+        '''Add playerids whose information was just loaded, into the database of engine when given.
+        Players of another database than the index was built from start the index over, the next
+        refresh then reads every player of the new database.'''
+
+        ids = _as_ids(playerids)
+        ids = ids[ids >= 0]
+
+        if engine is not None:
+            self.use_database(engine)
+
+        with self.lock:
+            self.ids = np.union1d(self.ids, ids)
+
+    def use_database(self, engine):
+        '''Start the index over when it was built from another database than the one of engine'''
+
+        database = engine.url.render_as_string(hide_password=True)
+        if self.database is not None and self.database != database:
+            logger.info('Player index was built from %s, rebuilding it from %s', self.database, database)
+            self.clear()
+        self.database = database
+
+    def refresh(self, engine, table='player_info'):
+        '''Add the players loaded into table since the last refresh (every player the first time).
+        Returns the number of players added.'''
+
+        self.use_database(engine)
+        database = self.database
+
+        if not inspect(engine).has_table(table):
+            if len(self) or self.watermark is not None:
+                self.clear()
+                self.database = database
+                self.save()
+            return 0
+
+        ensure_index(table, ['load_date'], engine)
+
+        query = f'select playerid, load_date from {quote_ident(table)}'
+        params = {}
+        if self.watermark is not None:
+            query += ' where load_date >= :since'
+            params['since'] = self.watermark - self.overlap
+
+        with engine.connect() as conn:
+            rows = pd.read_sql(text(query), conn, params=params)
+
+        before = len(self)
+        self.add(rows.playerid)
+
+        latest = pd.to_datetime(rows.load_date).max()
+        if not pd.isna(latest) and (self.watermark is None or latest > self.watermark):
+            self.watermark = latest.to_pydatetime()
+
+        self.save()
+
+        return len(self) - before
+
+    def save(self):
+        '''Write the index to path atomically, nothing is written without a path'''
+
+        if not self.path:
+            return
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self.lock:
+            ids, watermark, database = self.ids, self.watermark, self.database
+
+        with open(self.path + '.tmp', 'wb') as f:
+            np.savez(f, ids=ids, watermark=np.datetime64(watermark, 'us') if watermark else np.datetime64('NaT', 'us'),
+                     database=np.str_(database or ''))
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        with self.lock:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.watermark = None
+            self.database = None
+
+def _as_ids(playerids):
+    '''Playerids (strings or numbers) as an int64 array, ids that are not numbers become -1'''
+
+    return pd.to_numeric(pd.Series(playerids, dtype=object), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
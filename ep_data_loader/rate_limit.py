@@ -0,0 +1,171 @@
+from email.utils import parsedate_to_datetime
+from collections import deque
+import threading
+import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket(object):
+    '''Token bucket allowing `rate` requests per second with bursts of up to `burst` requests.
+    Thread safe, acquire blocks until a token is available.'''
+
+    def __init__(self, rate, burst):
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # no requests are let through before this time (set by Retry-After)
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        '''Take one token, sleeping until one is available'''
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+
+            time.sleep(wait)
+
+    def block(self, seconds):
+        '''Stop handing out tokens for the next `seconds` seconds'''
+
+        with self.lock:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0
+            self.updated = now
+
+class RateLimiter(object):
+    '''Per host adaptive rate limiter shared by every fetcher. Each host gets a token bucket
+    starting at `rate` requests per second. The rate is raised additively while requests succeed
+    and cut multiplicatively when throttled (HTTP 429) or when the error rate over the last
+    `window` requests exceeds `max_error_rate`.
+    '''
+
+    def __init__(self,
+        rate=2,
+        burst=4,
+        min_rate=0.2,
+        max_rate=10,
+        increase=0.25,
+        decrease=0.5,
+        window=20,
+        max_error_rate=0.1,
+        default_retry_after=30
+        ):
+
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.default_retry_after = default_retry_after
+
+        self.buckets = {}
+        self.outcomes = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(min(self.rate, self.max_rate), self.burst)
+                self.outcomes[host] = deque(maxlen=self.window)
+
+            return self.buckets[host]
+
+    def acquire(self, host):
+        '''Block until a request to host is allowed'''
+
+        self.bucket(host).acquire()
+
+    def _set_rate(self, host, rate):
+        bucket = self.bucket(host)
+        with bucket.lock:
+            bucket._refill(time.monotonic())
+            bucket.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def _record(self, host, failed):
+        '''Record a request outcome and adjust the host rate once a full window has been observed'''
+
+        bucket = self.bucket(host)
+        outcomes = self.outcomes[host]
+
+        with self.lock:
+            outcomes.append(failed)
+            if len(outcomes) < self.window:
+                return
+            error_rate = sum(outcomes) / len(outcomes)
+            outcomes.clear()
+
+        if error_rate > self.max_error_rate:
+            self._set_rate(host, bucket.rate * self.decrease)
+        elif error_rate == 0:
+            self._set_rate(host, bucket.rate + self.increase)
+
+    def set_max_rate(self, max_rate):
+        '''Change the rate ceiling of every host, e.g. to share a global rate between workers'''
+
+        self.max_rate = max_rate
+        with self.lock:
+            hosts = list(self.buckets)
+
+        for host in hosts:
+            self._set_rate(host, min(self.buckets[host].rate, max_rate))
+
+    def success(self, host):
+        self._record(host, False)
+
+    def failure(self, host):
+        self._record(host, True)
+
+    def throttled(self, host, retry_after=None):
+        '''Handle a 429 response, pausing the host for Retry-After seconds and cutting its rate'''
+
+        seconds = parse_retry_after(retry_after)
+        if seconds is None:
+            seconds = self.default_retry_after
+
+        bucket = self.bucket(host)
+        logger.warning('Throttled by %s, pausing %ss at %s req/s', host, round(seconds, 1), round(bucket.rate, 2),
+                       extra={'host' : host, 'retry_after' : seconds})
+
+        bucket.block(seconds)
+        self._set_rate(host, bucket.rate * self.decrease)
+
+        with self.lock:
+            self.outcomes[host].clear()
+
+def parse_retry_after(value):
+    '''Return seconds to wait from a Retry-After header given as seconds or an HTTP date'''
+
+    if value is None:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
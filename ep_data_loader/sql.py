@@ -28,4 +28,30 @@ where
 order by 
   draft_year_eligible desc nulls last, 
   date_of_birth desc nulls last
+'''
+
+CURRENT_SEASON_PLAYERS = '''
+select 
+  distinct playerid, 
+  shortname 
+from 
+  (
+    select playerid, shortname, year from skater_stats 
+    union all 
+    select playerid, shortname, year from goalie_stats
+  ) stats 
+where 
+  year = (
+    select 
+      case when date_part('month', CURRENT_DATE) between 8 
+      and 12 then concat(
+        date_part('year', CURRENT_DATE), 
+        '-', 
+        date_part('year', CURRENT_DATE)+ 1
+      ) else concat(
+        date_part('year', CURRENT_DATE)-1, 
+        '-', 
+        date_part('year', CURRENT_DATE)
+      ) end
+  )
 '''
\ No newline at end of file
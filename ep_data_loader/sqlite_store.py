@@ -0,0 +1,18 @@
+import sqlite3
+import os
+
+def connect(path, *schema, timeout=5):
+    '''Open the SQLite file of a local store (path=None keeps it in memory only), shared by the
+    threads of a process. The directory of path is created when missing, the journal is switched to
+    WAL so readers do not block the writer and the schema statements (create ... if not exists) are
+    run. Stores may share a file as long as their tables differ.'''
+
+    if path and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    conn = sqlite3.connect(path or ':memory:', timeout=timeout, check_same_thread=False, isolation_level=None)
+    conn.execute('pragma journal_mode=wal')
+    for statement in schema:
+        conn.execute(statement)
+
+    return conn
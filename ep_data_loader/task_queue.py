@@ -0,0 +1,200 @@
+from contextlib import contextmanager
+import threading
+import json
+import time
+
+from ep_data_loader.sqlite_store import connect
+
+class TaskQueue(object):
+    '''Work queue shared by the workers of a distributed load, stored in a SQLite file for workers on
+    one host or in postgres (pass a sqlalchemy engine) for workers spread over several hosts.
+
+    Tasks are a kind ('league_season', 'player_info') and a json payload, enqueueing the same task
+    twice is a no-op. Workers lease tasks for lease_seconds and extend their leases with heartbeats,
+    tasks whose lease expired (the worker died) are handed to the next worker asking. A task is
+    failed for good after max_attempts leases. Postgres workers claim tasks with
+    FOR UPDATE SKIP LOCKED, SQLite workers with an immediate transaction. Statements touching
+    several tasks lock them in id order, so a heartbeat and a completion of the same tasks cannot
+    deadlock.
+    '''
+
+    def __init__(self, path='data/queue.sqlite', engine=None, lease_seconds=300, max_attempts=3):
+
+        self.path = path
+        self.engine = engine
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+
+        if engine is None:
+            self.conn = connect(path, timeout=60)
+
+        id_column = 'id integer primary key' if engine is None else 'id bigserial primary key'
+
+        with self.transaction() as cursor:
+            cursor.execute(f'''
+                create table if not exists queue_tasks (
+                    {id_column},
+                    kind text not null,
+                    payload text not null,
+                    status text not null,
+                    worker text,
+                    lease_expires double precision,
+                    attempts integer not null default 0,
+                    error text,
+                    updated double precision not null,
+                    unique (kind, payload)
+                )''')
+            cursor.execute('create index if not exists queue_tasks_status on queue_tasks (kind, status, id)')
+            cursor.execute('''
+                create table if not exists queue_workers (
+                    worker text primary key,
+                    heartbeat double precision not null
+                )''')
+
+    @contextmanager
+    def transaction(self):
+        '''Cursor running its statements in one transaction, writers are serialized on SQLite'''
+
+        if self.engine is None:
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('begin immediate')
+                try:
+                    yield cursor
+                    cursor.execute('commit')
+                except:
+                    cursor.execute('rollback')
+                    raise
+            return
+
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def sql(self, query):
+        '''Use the placeholder style of the backend, queries are written with ?'''
+
+        return query if self.engine is None else query.replace('?', '%s')
+
+    def locking(self, clause):
+        '''Row locking clause for postgres, SQLite transactions already hold the database lock'''
+
+        return '' if self.engine is None else clause
+
+    def enqueue(self, kind, payloads):
+        '''Add tasks of a kind for each payload dict, tasks already queued are left as they are'''
+
+        now = time.time()
+        rows = [(kind, json.dumps(payload, sort_keys=True), now) for payload in payloads]
+
+        with self.transaction() as cursor:
+            cursor.executemany(self.sql("insert into queue_tasks (kind, payload, status, updated) "
+                                        "values (?, ?, 'pending', ?) on conflict (kind, payload) do nothing"), rows)
+
+    def lease(self, worker, kind, limit=1):
+        '''Lease up to limit pending (or expired) tasks of a kind to worker. Returns a list of
+        (task id, payload dict).'''
+
+        now = time.time()
+        skip_locked = self.locking('for update skip locked')
+
+        with self.transaction() as cursor:
+            # tasks whose last lease expired after max_attempts are not handed out again
+            cursor.execute(self.sql(f'''
+                update queue_tasks set status = 'failed', error = coalesce(error, 'lease expired')
+                where id in (
+                    select id from queue_tasks
+                    where kind = ? and status = 'leased' and lease_expires < ? and attempts >= ?
+                    order by id
+                    {skip_locked})'''),
+                (kind, now, self.max_attempts))
+            cursor.execute(self.sql(f'''
+                update queue_tasks set status = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated = ?
+                where id in (
+                    select id from queue_tasks
+                    where kind = ? and (status = 'pending' or (status = 'leased' and lease_expires < ?))
+                    order by id
+                    limit ?
+                    {skip_locked})
+                returning id, payload'''),
+                (worker, now + self.lease_seconds, now, kind, now, limit))
+            rows = cursor.fetchall()
+
+        return [(id_, json.loads(payload)) for id_, payload in sorted(rows)]
+
+    def heartbeat(self, worker):
+        '''Record that worker is alive and extend the leases of its tasks'''
+
+        now = time.time()
+
+        with self.transaction() as cursor:
+            cursor.execute(self.sql('insert into queue_workers values (?, ?) '
+                                    'on conflict (worker) do update set heartbeat = excluded.heartbeat'),
+                           (worker, now))
+            cursor.execute(self.sql(f'''
+                update queue_tasks set lease_expires = ?
+                where id in (
+                    select id from queue_tasks where worker = ? and status = 'leased'
+                    order by id
+                    {self.locking('for update')})'''),
+                (now + self.lease_seconds, worker))
+
+    def complete(self, worker, task_ids):
+        '''Mark tasks done, tasks whose lease has been handed to another worker are left alone'''
+
+        with self.transaction() as cursor:
+            cursor.executemany(self.sql("update queue_tasks set status = 'done', lease_expires = null, updated = ? "
+                                        "where id = ? and worker = ? and status = 'leased'"),
+                               [(time.time(), id_, worker) for id_ in sorted(task_ids)])
+
+    def fail(self, worker, task_ids, error=None):
+        '''Return tasks to the queue, or fail them for good once they used max_attempts leases'''
+
+        with self.transaction() as cursor:
+            cursor.executemany(self.sql('''
+                update queue_tasks set
+                    status = case when attempts >= ? then 'failed' else 'pending' end,
+                    lease_expires = null, error = ?, updated = ?
+                where id = ? and worker = ? and status = 'leased' '''),
+                [(self.max_attempts, None if error is None else str(error), time.time(), id_, worker)
+                 for id_ in sorted(task_ids)])
+
+    def retry_failed(self, kind=None):
+        '''Put failed tasks (of a kind) back in the queue with their attempts reset'''
+
+        with self.transaction() as cursor:
+            cursor.execute(self.sql("update queue_tasks set status = 'pending', attempts = 0, error = null "
+                                    "where status = 'failed' and (? is null or kind = ?)"), (kind, kind))
+
+    def live_workers(self, window):
+        '''Return the number of workers with a heartbeat in the last window seconds'''
+
+        with self.transaction() as cursor:
+            cursor.execute(self.sql('select count(*) from queue_workers where heartbeat > ?'), (time.time() - window,))
+            return cursor.fetchone()[0]
+
+    def summary(self):
+        '''Return task counts by kind and status'''
+
+        with self.transaction() as cursor:
+            cursor.execute('select kind, status, count(*) from queue_tasks group by kind, status')
+            rows = cursor.fetchall()
+
+        summary = {}
+        for kind, status, count in rows:
+            summary.setdefault(kind, {})[status] = count
+
+        return summary
+
+    def close(self):
+        if self.engine is None:
+            self.conn.close()
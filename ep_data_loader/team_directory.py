@@ -0,0 +1,81 @@
+import datetime
+import threading
+import json
+import time
+
+from ep_data_loader.sqlite_store import connect
+
+class TeamDirectory(object):
+    '''Teams of each league season stored in a SQLite file (path=None keeps them in memory only),
+    as (teamid, team) pairs along with the source of the list: 'standings' for the league
+    standings, 'team_comparison' for leagues without standings or 'empty' when neither had any team.
+
+    Empty league seasons are cached too (negative caching) so repeat loads skip them without
+    any request. Entries expire after max_age, empty ones after empty_max_age, since teams can
+    still be added to a current season.
+    '''
+
+    def __init__(self, path='data/league_metadata.sqlite', max_age=datetime.timedelta(days=30),
+                 empty_max_age=datetime.timedelta(days=7)):
+
+        self.path = path
+        self.max_age = max_age
+        self.empty_max_age = empty_max_age
+        self.lock = threading.Lock()
+
+        self.conn = connect(path, '''
+            create table if not exists teams (
+                league text not null,
+                season text not null,
+                source text not null,
+                teams text not null,
+                updated real not null,
+                primary key (league, season)
+            )''')
+
+    def get(self, league, season):
+        '''Return (teams, source) for a league season, None when unknown or expired. teams is a
+        list of (teamid, team), empty when the league season has no teams.'''
+
+        with self.lock:
+            row = self.conn.execute('select source, teams, updated from teams where league = ? and season = ?',
+                                    (league, season)).fetchone()
+
+        if row is None:
+            return None
+
+        source, teams, updated = row
+        max_age = self.empty_max_age if source == 'empty' else self.max_age
+        if time.time() - updated > max_age.total_seconds():
+            return None
+
+        return [tuple(team) for team in json.loads(teams)], source
+
+    def put(self, league, season, teams, source):
+        '''Record the (teamid, team) list of a league season, an empty list is recorded as empty'''
+
+        teams = [(str(teamid), team) for teamid, team in teams]
+
+        with self.lock:
+            self.conn.execute('insert or replace into teams values (?, ?, ?, ?, ?)',
+                              (league, season, source if teams else 'empty', json.dumps(teams), time.time()))
+
+    def is_empty(self, league, season):
+        '''True when the league season is known to have no teams'''
+
+        entry = self.get(league, season)
+
+        return entry is not None and entry[1] == 'empty'
+
+    def summary(self):
+        '''Return the number of league seasons by source'''
+
+        with self.lock:
+            return dict(self.conn.execute('select source, count(*) from teams group by source').fetchall())
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('delete from teams')
+
+    def close(self):
+        self.conn.close()
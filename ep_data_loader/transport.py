@@ -0,0 +1,145 @@
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+import requests
+import logging
+import random
+import time
+
+from ep_data_loader.rate_limit import RateLimiter
+from ep_data_loader.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+### hosts the fetchers talk to, each gets its own keep-alive connection pool
+hosts = ['gql.eliteprospects.com', 'www.eliteprospects.com']
+
+### transient responses that are safe to retry for idempotent GETs
+retry_statuses = {500, 502, 503, 504}
+
+class Transport(object):
+    '''Pooled HTTP session shared by every fetcher. Keeps connections to the elite prospects
+    hosts alive between requests and retries transient failures with jittered exponential backoff.
+    Every request first takes a token from the per host rate limiter. When a response cache is
+    given, get_text serves repeated requests from it without touching the network.
+    '''
+
+    def __init__(self,
+        pool_size=16,
+        max_retries=4,
+        backoff_factor=0.5,
+        max_backoff=30,
+        timeout=30,
+        rate_limiter=None,
+        cache=None
+        ):
+
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        # retries are handled here so the backoff is jittered and failures can be counted
+        adapter = HTTPAdapter(pool_connections=len(hosts), pool_maxsize=pool_size, max_retries=0)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff(self, attempt):
+        '''Return seconds to wait before retry number attempt (full jitter exponential backoff)'''
+
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def get(self, url, headers=None):
+        '''GET a url through the pooled session, retrying connection errors, timeouts, transient
+        5xx responses and 429 throttling (after Retry-After). Returns the last response or raises
+        the last error. Latency, status, bytes and retries of every attempt are recorded in the
+        metrics registry.'''
+
+        host = urlparse(url).netloc
+        metrics = get_metrics()
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            self.rate_limiter.acquire(host)
+
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.observe('http_request_seconds', time.perf_counter() - start, host=host)
+                metrics.inc('http_requests_total', host=host, status=type(e).__name__)
+                self.rate_limiter.failure(host)
+                if last_attempt:
+                    raise
+                metrics.inc('http_retries_total', host=host, reason=type(e).__name__)
+                logger.warning('Retrying %s after error: %s', url, e, extra={'host' : host, 'attempt' : attempt})
+            else:
+                metrics.observe('http_request_seconds', time.perf_counter() - start, host=host)
+                metrics.inc('http_requests_total', host=host, status=str(response.status_code))
+                metrics.inc('http_response_bytes_total', len(response.content), host=host)
+
+                if response.status_code == 429:
+                    # the limiter pauses the host for Retry-After, no extra backoff needed
+                    self.rate_limiter.throttled(host, response.headers.get('Retry-After'))
+                    if last_attempt:
+                        return response
+                    metrics.inc('http_retries_total', host=host, reason='429')
+                    continue
+
+                if response.status_code not in retry_statuses:
+                    self.rate_limiter.success(host)
+                    return response
+
+                self.rate_limiter.failure(host)
+                if last_attempt:
+                    return response
+                metrics.inc('http_retries_total', host=host, reason=str(response.status_code))
+                logger.warning('Retrying %s after HTTP %s', url, response.status_code,
+                               extra={'host' : host, 'attempt' : attempt})
+
+            time.sleep(self.backoff(attempt))
+
+    def get_text(self, url, headers=None, cache_key=None, season=None, cacheable=None):
+        '''GET a url and return the response body. Successful responses are stored in the
+        response cache under cache_key (defaults to the url) with a TTL based on season, unless
+        cacheable is given and returns False for the body (e.g. an error payload sent with a 200).'''
+
+        key = cache_key or url
+
+        if self.cache is not None:
+            text = self.cache.get(key)
+            if text is not None:
+                get_metrics().inc('http_cache_hits_total')
+                return text
+
+        response = self.get(url, headers=headers)
+        response.raise_for_status()
+
+        if self.cache is not None and (cacheable is None or cacheable(response.text)):
+            self.cache.set(key, response.text, season)
+
+        return response.text
+
+    def close(self):
+        self.session.close()
+
+_default_transport = None
+
+def get_transport():
+    '''Return the process wide default transport, creating it on first use'''
+
+    global _default_transport
+
+    if _default_transport is None:
+        _default_transport = Transport()
+
+    return _default_transport
+
+def set_transport(transport):
+    '''Replace the process wide default transport used when no transport is passed to a fetcher'''
+
+    global _default_transport
+    _default_transport = transport
@@ -0,0 +1,146 @@
+import pandas as pd
+import threading
+import logging
+import socket
+import time
+import os
+
+from ep_data_loader.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+def enqueue_league_seasons(queue, league_seasons):
+    '''Producer side of a distributed load, queue a league_season task per (league, season) pair'''
+
+    queue.enqueue('league_season', [{'league' : league, 'season' : season} for league, season in league_seasons])
+
+class Worker(object):
+    '''Runs tasks leased from a TaskQueue with a Scraper until the queue is drained. league_season
+    tasks are scraped and written with Scraper.stream_league_seasons and queue a player_info task for
+    each player found, player_info tasks are leased chunk_size at a time and loaded with
+    Scraper.load_player_info.
+
+    A heartbeat thread keeps the leases of the running tasks alive. With global_rate the request rate
+    of every host is capped at global_rate divided by the number of live workers, so any number of
+    workers share one rate limit. Each worker writes its own run report and prometheus textfile,
+    named after the worker, to the Scraper report_dir. Workers write to postgres only by default, local
+    csv files would be overwritten by every worker on the same host. A task whose write fails is marked
+    failed and the worker moves on.
+    '''
+
+    def __init__(self,
+        scraper,
+        queue,
+        name = None,
+        output = 'postgres_only',
+        chunk_size = 500,
+        heartbeat_interval = 30,
+        global_rate = None,
+        poll_interval = 10
+        ):
+
+        self.scraper = scraper
+        self.queue = queue
+        self.name = name or f'{socket.gethostname()}-{os.getpid()}'
+        self.output = output
+        self.chunk_size = chunk_size
+        self.heartbeat_interval = heartbeat_interval
+        self.global_rate = global_rate
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+
+    def heartbeat(self):
+        '''Extend the leases of this worker and adjust its share of the global rate'''
+
+        self.queue.heartbeat(self.name)
+
+        if self.global_rate:
+            workers = max(1, self.queue.live_workers(self.heartbeat_interval * 3))
+            self.scraper.transport.rate_limiter.set_max_rate(self.global_rate / workers)
+
+    def _heartbeat_loop(self):
+        while not self.stopped.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.warning('Heartbeat failed for %s: %s', self.name, e, extra={'worker' : self.name})
+
+    def run_league_season(self, task_id, payload):
+        '''Scrape and write a league season, then queue its players for player info'''
+
+        league, year = payload['league'], payload['season']
+
+        try:
+            for league, year, players in self.scraper.stream_league_seasons([(league, year)], self.output):
+                if players is None:
+                    self.queue.fail(self.name, [task_id], f'{league} {year} failed on {self.name}')
+                    return
+
+                self.queue.enqueue('player_info', players.drop_duplicates('playerid').to_dict('records'))
+        except Exception as e:
+            logger.warning('Failed to write %s %s: %s', league, year, e,
+                           extra={'worker' : self.name, 'league' : league, 'season' : year})
+            self.queue.fail(self.name, [task_id], e)
+            return
+
+        self.queue.complete(self.name, [task_id])
+
+    def run_player_info(self, tasks):
+        '''Load player info for a chunk of player_info tasks'''
+
+        task_ids = {str(payload['playerid']) : task_id for task_id, payload in tasks}
+        players = pd.DataFrame([payload for task_id, payload in tasks])
+
+        failed_before = len(self.scraper.failed_players)
+        try:
+            self.scraper.load_player_info(players, self.output)
+        except Exception as e:
+            # chunks written before the error are loaded again when the tasks are retried
+            logger.warning('Failed to write player info: %s', e, extra={'worker' : self.name})
+            self.queue.fail(self.name, list(task_ids.values()), e)
+            return
+
+        failed = {str(playerid) : e for playerid, shortname, e in self.scraper.failed_players[failed_before:]}
+
+        for playerid, e in failed.items():
+            self.queue.fail(self.name, [task_ids[playerid]], e)
+        self.queue.complete(self.name, [task_id for playerid, task_id in task_ids.items() if playerid not in failed])
+
+    def run(self, exit_when_idle=True):
+        '''Lease and run tasks until the queue has nothing pending or leased (or forever with
+        exit_when_idle=False). League seasons are run before player info since they add to it.'''
+
+        logger.info('Worker %s starting', self.name, extra={'worker' : self.name})
+        get_metrics().reset()
+
+        self.heartbeat()
+        thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                tasks = self.queue.lease(self.name, 'league_season')
+                if tasks:
+                    self.run_league_season(*tasks[0])
+                    continue
+
+                tasks = self.queue.lease(self.name, 'player_info', self.chunk_size)
+                if tasks:
+                    self.run_player_info(tasks)
+                    continue
+
+                summary = self.queue.summary()
+                busy = sum(counts.get('pending', 0) + counts.get('leased', 0) for counts in summary.values())
+                if exit_when_idle and not busy:
+                    break
+
+                time.sleep(self.poll_interval)
+
+        finally:
+            self.stopped.set()
+            thread.join()
+
+        logger.info('Worker %s done: %s', self.name, self.queue.summary(), extra={'worker' : self.name})
+
+        if self.scraper.report_dir:
+            get_metrics().write(self.scraper.report_dir, name=f'ep_data_loader_{self.name}')
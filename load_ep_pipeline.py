@@ -1,4 +1,11 @@
 from ep_data_loader import ep_data_loader
+from ep_data_loader.cache import ResponseCache
+from ep_data_loader.manifest import TaskManifest
+from ep_data_loader.fingerprint import PayloadFingerprints
+from ep_data_loader.player_index import PlayerIndex
+from ep_data_loader.league_seasons import LeagueSeasons
+from ep_data_loader.team_directory import TeamDirectory
+from ep_data_loader.metrics import configure_logging
 
 import argparse
 
@@ -9,9 +16,38 @@ if __name__ == '__main__':
     parser.add_argument("-s", "--start", default = 2024, help="Start Year for season scraping")
     parser.add_argument("-e", "--end", default = 2024, help="End Year for season scraping")
     parser.add_argument("-i", "--load_player_info", default = True, help="Load player bio info (This takes can take a day and up to a week depending on how many seasons are loaded)")
+    parser.add_argument("-m", "--write_mode", default = 'append', choices = ['append', 'merge'], help="append adds rows, merge upserts rows on their natural keys")
+
+    parser.add_argument("-c", "--cache", default = None, help="Response cache file, completed seasons and recent player pages are served from it instead of the network, e.g. data/cache/responses.sqlite")
+
+    parser.add_argument("-r", "--manifest", default = None, help="Task manifest file, a restarted load skips the league seasons and teams already loaded")
+
+    parser.add_argument("-f", "--fingerprints", default = None, help="Payload fingerprint file, teams whose stats are unchanged since the last load are not rewritten")
+
+    parser.add_argument("-b", "--refresh_budget", default = None, type = int, help="Only load the bios of up to this many current season players with a missing or stale bio instead of running a full load")
+    parser.add_argument("-x", "--player_index", default = 'data/player_index.npz', help="Player index file caching the playerids of player_info, refreshed incrementally by load_date")
+    parser.add_argument("-l", "--league_seasons", default = None, help="League season metadata file caching the seasons each league has data for, the other seasons are not requested")
+    parser.add_argument("-t", "--team_directory", default = None, help="Team directory file caching the teams of each league season, including league seasons without teams")
+    parser.add_argument("--report_dir", default = 'data/reports', help="Directory for the json run report and the prometheus textfile")
+    parser.add_argument("--json_logs", action = "store_true", help="Log one json object per line")
 
     args = parser.parse_args()
 
-    ep = ep_data_loader.Scraper(start_year=args.start, end_year=args.end, prod_db=args.prod)
+    configure_logging(json_logs=args.json_logs)
+
+    cache = ResponseCache(args.cache) if args.cache else None
+    manifest = TaskManifest(args.manifest) if args.manifest else None
+    fingerprints = PayloadFingerprints(args.fingerprints) if args.fingerprints else None
+    player_index = PlayerIndex(args.player_index) if args.player_index else None
+    league_seasons = LeagueSeasons(args.league_seasons) if args.league_seasons else None
+    team_directory = TeamDirectory(args.team_directory) if args.team_directory else None
+
+    ep = ep_data_loader.Scraper(start_year=args.start, end_year=args.end, prod_db=args.prod, write_mode=args.write_mode,
+                                cache=cache, manifest=manifest, fingerprints=fingerprints, report_dir=args.report_dir,
+                                player_index=player_index, league_seasons=league_seasons,
+                                team_directory=team_directory)
 
-    ep.full_data_load(collect_player_info=args.load_player_info, output='postgres')
+    if args.refresh_budget is not None:
+        ep.refresh_stale_player_info(budget=args.refresh_budget)
+    else:
+        ep.full_data_load(collect_player_info=args.load_player_info, output='postgres')
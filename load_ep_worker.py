@@ -0,0 +1,45 @@
+from ep_data_loader import ep_data_loader
+from ep_data_loader.cache import ResponseCache
+from ep_data_loader.task_queue import TaskQueue
+from ep_data_loader.worker import Worker, enqueue_league_seasons
+from ep_data_loader.metrics import configure_logging
+
+import argparse
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Distributed load: queue league seasons with --produce, then start any number of workers on any number of hosts")
+    parser.add_argument("-p", "--prod", required=True, help="Required for database writes")
+    parser.add_argument("-s", "--start", default = 2024, type = int, help="Start Year for season scraping (with --produce)")
+    parser.add_argument("-e", "--end", default = 2024, type = int, help="End Year for season scraping (with --produce)")
+    parser.add_argument("--produce", action = "store_true", help="Queue the league seasons between start and end the leagues have data for, then exit")
+    parser.add_argument("-q", "--queue", default = 'postgres', help="'postgres' to share the queue through the database across hosts, or a SQLite file for workers on one host")
+    parser.add_argument("-o", "--output", default = 'postgres_only', choices = ['postgres_only', 'postgres', 'parquet'], help="Where workers write their results, postgres also writes local csv files which workers on the same host overwrite")
+    parser.add_argument("-m", "--write_mode", default = 'merge', choices = ['append', 'merge'], help="append adds rows, merge upserts rows on their natural keys so retried tasks do not duplicate rows")
+    parser.add_argument("-c", "--cache", default = None, help="Response cache file shared by the workers of a host, e.g. data/cache/responses.sqlite")
+    parser.add_argument("-r", "--rate", default = None, type = float, help="Requests per second per host shared by all live workers")
+    parser.add_argument("-n", "--name", default = None, help="Worker name, defaults to host-pid")
+    parser.add_argument("--retry_failed", action = "store_true", help="Put failed tasks back in the queue, then exit")
+    parser.add_argument("--report_dir", default = 'data/reports', help="Directory for the worker json run report and prometheus textfile")
+    parser.add_argument("--json_logs", action = "store_true", help="Log one json object per line")
+
+    args = parser.parse_args()
+
+    configure_logging(json_logs=args.json_logs)
+
+    ep = ep_data_loader.Scraper(start_year=args.start, end_year=args.end, prod_db=args.prod, write_mode=args.write_mode,
+                                report_dir=args.report_dir, cache=ResponseCache(args.cache) if args.cache else None)
+
+    queue = TaskQueue(engine=ep.engine) if args.queue == 'postgres' else TaskQueue(args.queue)
+
+    if args.produce:
+        enqueue_league_seasons(queue, ep.prune_league_seasons([(league, season) for league in ep.leagues
+                                                                for season in ep.seasons]))
+        print(queue.summary())
+
+    elif args.retry_failed:
+        queue.retry_failed()
+        print(queue.summary())
+
+    else:
+        Worker(ep, queue, name=args.name, output=args.output, global_rate=args.rate).run()
@@ -0,0 +1,29 @@
+from ep_data_loader import ep_data_loader
+from ep_data_loader.metrics import configure_logging
+
+import argparse
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Stream the loader tables from one database to another, dev to prod by default")
+    parser.add_argument("--source", default = 'dev', choices = ['dev', 'prod'], help="Database copied from")
+    parser.add_argument("--target", default = 'prod', choices = ['dev', 'prod'], help="Database copied to")
+    parser.add_argument("-t", "--tables", nargs = '+', default = None, help="Tables to copy, defaults to skater_stats, goalie_stats, team_stats and player_info")
+    parser.add_argument("-i", "--incremental", action = "store_true", help="Only copy the rows loaded after the latest load_date of each target table")
+    parser.add_argument("-m", "--merge", action = "store_true", help="Upsert rows on their natural keys instead of replacing (full copy) or appending (incremental) them")
+    parser.add_argument("-c", "--chunk_size", default = 50000, type = int, help="Rows read and written at a time")
+    parser.add_argument("--json_logs", action = "store_true", help="Log one json object per line")
+
+    args = parser.parse_args()
+
+    configure_logging(json_logs=args.json_logs)
+
+    if args.source == args.target:
+        parser.error('source and target must be different databases')
+
+    source = ep_data_loader.create_db_engine(prod=args.source == 'prod')
+    target = ep_data_loader.create_db_engine(prod=args.target == 'prod')
+
+    copied = ep_data_loader.replicate_tables(source, target, names=args.tables, incremental=args.incremental,
+                                             merge=args.merge, chunk_size=args.chunk_size)
+    print(copied)